@@ -0,0 +1,119 @@
+"""
+Synthetic Google Play Music API payloads for benchmarks.
+"""
+import random
+
+
+def make_track_payload(index):
+    """
+    Return a library song dict shaped like ``Mobileclient.get_all_songs()`` items.
+    """
+    return {
+        'kind': 'sj#track',
+        'id': '{:08x}-931c-30ed-8790-f7fce8943c85'.format(index),
+        'clientId': '+eGFGTbiyMktbPuvB5MfsA',
+        'storeId': 'Txsffypukmmeg3iwl3w{:07d}'.format(index),
+        'nid': 'Txsffypukmmeg3iwl3w{:07d}'.format(index),
+        'trackType': '8',
+        'title': u'Track title number {}'.format(index),
+        'artist': u'Artist {}'.format(index % 500),
+        'albumArtist': u'Artist {}'.format(index % 500),
+        'album': u'Album {}'.format(index % 3000),
+        'composer': '',
+        'comment': '',
+        'genre': 'Progressive Metal',
+        'year': 2011,
+        'trackNumber': index % 12,
+        'discNumber': 1,
+        'totalDiscCount': 1,
+        'totalTrackCount': 12,
+        'durationMillis': str(180000 + index % 120000),
+        'estimatedSize': '17229205',
+        'beatsPerMinute': 0,
+        'playCount': index % 40,
+        'rating': '5' if index % 20 == 0 else '0',
+        'explicitType': '2',
+        'deleted': False,
+        'creationTimestamp': '1330879409467830',
+        'lastModifiedTimestamp': str(1330881158830924 + index),
+        'lastRatingChangeTimestamp': str(1330881158830924 + (index * 7919) % 100003),
+        'recentTimestamp': '1372040508935000',
+        'albumId': 'Bdkf6ywxmrhflvtasn{:07d}'.format(index % 3000),
+        'artistId': ['Aod62yyj3u3xsjtoog{:07d}'.format(index % 500)],
+        'albumArtRef': [{
+            'url': 'http://lh6.ggpht.com/album-{}'.format(index % 3000),
+            'aspectRatio': '1',
+            'autogen': False,
+            'kind': 'sj#imageRef'
+        }],
+        'artistArtRef': [
+            {
+                'url': 'http://lh3.ggpht.com/artist-{}-{}'.format(index % 500, ratio),
+                'aspectRatio': ratio,
+                'autogen': False,
+                'kind': 'sj#imageRef'
+            }
+            for ratio
+            in ('2', '1')
+        ],
+    }
+
+
+def make_library(count):
+    """
+    Return a list of *count* library song dicts.
+    """
+    return [make_track_payload(index) for index in range(count)]
+
+
+def make_playlists(library, playlist_count=20, seed=0):
+    """
+    Return playlist dicts shaped like ``Mobileclient.get_all_user_playlist_contents()`` items.
+
+    Entries reference library tracks by ID (without embedded track data),
+    so every entry has to be resolved with :meth:`clay.gp._GP.get_track_by_id`.
+    Playlists contain as many entries as there are library tracks in total.
+    """
+    rand = random.Random(seed)
+    playlist_len = max(len(library) // playlist_count, 1)
+    return [
+        {
+            'kind': 'sj#playlist',
+            'id': 'playlist-{}'.format(playlist_index),
+            'name': 'Playlist {}'.format(playlist_index),
+            'tracks': [
+                {
+                    'kind': 'sj#playlistEntry',
+                    'id': '{:08x}-0000-4000-8000-{:012x}'.format(playlist_index, entry_index),
+                    'trackId': rand.choice(library)['id'],
+                    'source': '1',
+                    'deleted': False,
+                }
+                for entry_index
+                in range(playlist_len)
+            ]
+        }
+        for playlist_index
+        in range(playlist_count)
+    ]
+
+
+def make_playlist_entry_pages(playlists, page_len=1000, seed=0):
+    """
+    Return entries of *playlists* (see :func:`.make_playlists`) split into pages
+    shaped like ``plentryfeed`` responses: entries of all playlists in random order,
+    each with ``playlistId`` & ``absolutePosition``.
+    """
+    entries = [
+        dict(
+            entry,
+            playlistId=playlist['id'],
+            absolutePosition='{:020d}'.format(position * 1000)
+        )
+        for playlist
+        in playlists
+        for position, entry
+        in enumerate(playlist['tracks'])
+    ]
+    random.Random(seed).shuffle(entries)
+    return [entries[start:start + page_len] for start in range(0, len(entries), page_len)]
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark suite.
+
+Times library loading, playlist parsing, song list building & filtering
+on synthetic libraries and reports peak memory of each case.
+
+Results are saved as JSON (``benchmarks/results/<commit>.json`` by default),
+so they can be compared between commits with ``--compare``.
+
+Usage: ``python benchmarks/suite.py [--sizes 1000 10000 100000] [--compare FILE]``
+"""
+# pylint: disable=wrong-import-position
+import sys
+sys.path.insert(0, '.')  # noqa
+
+from datetime import datetime
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+from clay.gp import gp, Track, Playlist, LikedSongs
+from clay.paging import LIST_PAGE_LEN, PlaylistBuilder
+from clay.songlist import SongListBox
+from clay.workers import worker_pool
+from benchmarks.fixtures import make_library, make_playlists, make_playlist_entry_pages
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SIZES = (1000, 10000, 100000)
+SCREEN_SIZE = (120, 50)
+FILTER_QUERY = 'number 12'
+
+
+class HeadlessApp(object):
+    """
+    Stand-in for :class:`clay.app.AppWidget` that does not draw anything.
+    """
+    def redraw(self):
+        """
+        Do nothing.
+        """
+
+    def append_cancel_action(self, _):
+        """
+        Do nothing.
+        """
+
+
+def load_library(payloads):
+    """
+    Fill library cache of :attr:`clay.gp.gp` with tracks built from *payloads*.
+    """
+    gp.cached_liked_songs = LikedSongs()
+    gp.cached_tracks = None
+    gp.cached_tracks = gp._build_library_tracks(payloads)  # pylint: disable=protected-access
+    return gp.cached_tracks
+
+
+def prepare_track_from_data(payloads):
+    """
+    Build library tracks from API payloads.
+    """
+    def run():
+        """
+        Benchmarked code.
+        """
+        gp.cached_liked_songs = LikedSongs()
+        Track.from_data(payloads, Track.SOURCE_LIBRARY, many=True)
+    return run
+
+
+def prepare_library_index(payloads):
+    """
+    Build library tracks along with lookup indexes.
+    """
+    return lambda: load_library(payloads)
+
+
+def prepare_playlist_entries(payloads):
+    """
+    Build playlists from pages of playlist entries the way library loading does,
+    resolving every entry by library track ID.
+    """
+    load_library(payloads)
+    playlists = make_playlists(payloads)
+    pages = make_playlist_entry_pages(playlists, LIST_PAGE_LEN)
+
+    def run():
+        """
+        Benchmarked code.
+        """
+        builder = PlaylistBuilder(lambda entry: Track.from_data(entry, Track.SOURCE_PLAYLIST))
+        builder.start([
+            Playlist(playlist_id=data['id'], name=data['name'], tracks=[])
+            for data
+            in playlists
+        ])
+        for entries in pages:
+            builder.add_entries(entries)
+        return builder.playlists
+    return run
+
+
+def prepare_songlist_populate(payloads):
+    """
+    Fill song list with all library tracks & render one screen.
+    """
+    tracks = load_library(payloads)
+    songlist = SongListBox(HeadlessApp())
+
+    def run():
+        """
+        Benchmarked code.
+        """
+        songlist.populate(tracks)
+        songlist.render(SCREEN_SIZE, focus=True)
+    return run
+
+
+def prepare_songlist_filter(payloads):
+    """
+    Type a filter query char by char, then erase it.
+    """
+    tracks = load_library(payloads)
+    songlist = SongListBox(HeadlessApp())
+    songlist.populate(tracks)
+
+    def run():
+        """
+        Benchmarked code.
+        """
+        songlist.invalidate_search_index()
+        for char in FILTER_QUERY:
+            songlist.perform_filtering(char)
+            songlist.move_down()
+        for _ in FILTER_QUERY:
+            songlist.perform_filtering('backspace')
+        songlist.end_filtering()
+    return run
+
+
+def prepare_liked_songs_sort(payloads):
+    """
+    Sort liked songs by rating change time (all tracks are liked.)
+    """
+    tracks = load_library(payloads)
+
+    def run():
+        """
+        Benchmarked code.
+        """
+        liked_songs = LikedSongs()
+        for track in tracks:
+            liked_songs.add_liked_song(track)
+        return liked_songs.tracks
+    return run
+
+
+CASES = (
+    ('track_from_data', prepare_track_from_data),
+    ('library_index', prepare_library_index),
+    ('playlist_entries', prepare_playlist_entries),
+    ('songlist_populate', prepare_songlist_populate),
+    ('songlist_filter', prepare_songlist_filter),
+    ('liked_songs_sort', prepare_liked_songs_sort),
+)
+
+
+def wait_for_workers():
+    """
+    Wait until background jobs (e.g. search index build) are finished,
+    so they don't affect timings.
+    """
+    while True:
+        stats = worker_pool.get_stats()
+        if not stats['busy'] and not stats['queued']:
+            return
+        time.sleep(0.01)
+
+
+def measure(prepare, payloads, repeat):
+    """
+    Return best time of *repeat* runs & peak memory (in bytes) of a single run.
+    """
+    run = prepare(payloads)
+    timings = []
+    for _ in range(repeat):
+        wait_for_workers()
+        gc.collect()
+        start = time.time()
+        run()
+        timings.append(time.time() - start)
+
+    wait_for_workers()
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def get_commit():
+    """
+    Return current git commit hash or ``None``.
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.STDOUT
+        ).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """
+    Print time & memory ratios of *results* relative to *baseline*.
+    """
+    print('\nCompared to {}:'.format(baseline.get('commit')))
+    for size, cases in sorted(results['results'].items(), key=lambda item: int(item[0])):
+        for name, result in cases.items():
+            base = baseline['results'].get(size, {}).get(name)
+            if base is None:
+                continue
+            print('{:>8}  {:20}  time x{:<6.2f}  memory x{:<6.2f}'.format(
+                size,
+                name,
+                result['seconds'] / base['seconds'] if base['seconds'] else 0,
+                float(result['peak_bytes']) / base['peak_bytes'] if base['peak_bytes'] else 0
+            ))
+
+
+def main():
+    """
+    Run benchmarks.
+    """
+    parser = argparse.ArgumentParser(description='Clay benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--cases', nargs='+', choices=[name for name, _ in CASES])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='results file (default: results/<commit>.json)')
+    parser.add_argument('--compare', help='results file to compare with')
+    args = parser.parse_args()
+
+    commit = get_commit()
+    results = dict(
+        commit=commit,
+        timestamp=datetime.now().isoformat(),
+        python=platform.python_version(),
+        results={}
+    )
+
+    print('{:>8}  {:20}  {:>10}  {:>10}'.format('tracks', 'case', 'time, s', 'peak, MB'))
+    for size in args.sizes:
+        payloads = make_library(size)
+        size_results = results['results'][str(size)] = {}
+        for name, prepare in CASES:
+            if args.cases and name not in args.cases:
+                continue
+            seconds, peak_bytes = measure(prepare, payloads, args.repeat)
+            size_results[name] = dict(seconds=round(seconds, 6), peak_bytes=peak_bytes)
+            print('{:>8}  {:20}  {:>10.4f}  {:>10.2f}'.format(
+                size, name, seconds, peak_bytes / 1048576.0
+            ))
+
+    output = args.output
+    if output is None:
+        if not os.path.isdir(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        output = os.path.join(RESULTS_DIR, '{}.json'.format(commit or 'results'))
+    with open(output, 'w') as results_file:
+        json.dump(results, results_file, indent=4, sort_keys=True)
+    print('\nResults saved to {}'.format(output))
+
+    if args.compare:
+        with open(args.compare, 'r') as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for library tracks.
+
+Compares memory retained by raw Google Play Music API payloads
+(which :class:`clay.gp.Track` used to keep in ``original_data``)
+with memory retained by compact :class:`clay.gp.Track` instances.
+
+Usage: ``python benchmarks/track_memory.py [TRACK_COUNT ...]``
+"""
+# pylint: disable=wrong-import-position
+import sys
+sys.path.insert(0, '.')  # noqa
+
+import gc
+import time
+import tracemalloc
+
+from clay.gp import Track
+from benchmarks.fixtures import make_library
+
+
+def measure(count):
+    """
+    Return (payload_bytes, track_bytes, build_seconds) for *count* tracks.
+    """
+    gc.collect()
+    tracemalloc.start()
+    payloads = make_library(count)
+    payload_bytes = tracemalloc.get_traced_memory()[0]
+
+    start = time.time()
+    tracks = Track.from_data(payloads, Track.SOURCE_LIBRARY, many=True)
+    build_seconds = time.time() - start
+
+    del payloads
+    gc.collect()
+    track_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(tracks) == count
+    return payload_bytes, track_bytes, build_seconds
+
+
+def main():
+    """
+    Run benchmark for each requested track count.
+    """
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 40000]
+    print('{:>8}  {:>16}  {:>16}  {:>8}'.format(
+        'tracks', 'API payloads, MB', 'Track objs, MB', 'build, s'
+    ))
+    for count in counts:
+        payload_bytes, track_bytes, build_seconds = measure(count)
+        print('{:>8}  {:>16.2f}  {:>16.2f}  {:>8.3f}'.format(
+            count,
+            payload_bytes / 1048576.0,
+            track_bytes / 1048576.0,
+            build_seconds
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,10 +22,18 @@ from clay.pages.mystations import MyStationsPage
 from clay.pages.playerqueue import QueuePage
 from clay.pages.search import SearchPage
 from clay.pages.settings import SettingsPage
-from clay.settings import settings
+from clay.settings import settings, MEGABYTE
 from clay.notifications import notification_area
 from clay.gp import gp
+from clay.eventhook import ui_dispatcher
+from clay.log import logger, DEFAULT_LOG_LEVEL, DEFAULT_MAX_RECORDS
 from clay.hotkeys import hotkey_manager
+from clay.workers import worker_pool
+from clay.metrics import api_metrics
+from clay.ipc import ipc_server
+from clay.redraw import RedrawScheduler
+
+DEFAULT_MAX_FPS = 20
 
 
 class AppWidget(urwid.Frame):
@@ -78,6 +86,7 @@ class AppWidget(urwid.Frame):
         self.tabs = [AppWidget.Tab(page) for page in self.pages]
         self.current_page = None
         self.loop = None
+        self.redraw_scheduler = None
 
         notification_area.set_app(self)
         self._login_notification = None
@@ -121,6 +130,7 @@ class AppWidget(urwid.Frame):
             gp.use_authtoken_async(
                 authtoken,
                 device_id,
+                username,
                 callback=self.on_check_authtoken
             )
         elif username and password and device_id:
@@ -180,6 +190,11 @@ class AppWidget(urwid.Frame):
         Assign a MainLoop to this app.
         """
         self.loop = loop
+        ui_dispatcher.set_loop(loop)
+        self.redraw_scheduler = RedrawScheduler(
+            loop,
+            settings.get('max_fps', 'clay_settings') or DEFAULT_MAX_FPS
+        )
 
     def set_page(self, slug):
         """
@@ -200,11 +215,14 @@ class AppWidget(urwid.Frame):
 
     def redraw(self):
         """
-        Redraw screen.
+        Schedule screen redraw.
         Needs to be called by other widgets if UI was changed from a different thread.
+
+        Can be called from any thread, screen is redrawn on main loop thread
+        (see :class:`clay.redraw.RedrawScheduler`.)
         """
-        if self.loop:
-            self.loop.draw_screen()
+        if self.redraw_scheduler:
+            self.redraw_scheduler.request()
 
     def append_cancel_action(self, action):
         """
@@ -321,6 +339,13 @@ class AppWidget(urwid.Frame):
         Quit app.
         """
         self.loop = None
+        if self.redraw_scheduler:
+            self.redraw_scheduler.stop()
+            self.redraw_scheduler = None
+        ipc_server.stop()
+        worker_pool.shutdown()
+        settings.flush_cache_index()
+        logger.flush()
         sys.exit(0)
 
     def handle_escape(self):
@@ -351,6 +376,22 @@ class MultilineVersionAction(argparse.Action):
         parser.exit(message=meta.COPYRIGHT_MESSAGE)
 
 
+def _configure_logging():
+    """
+    Apply logging settings from config.
+    """
+    log_max_size_mb = settings.get('log_max_size_mb', 'clay_settings')
+    log_rotate_hours = settings.get('log_rotate_hours', 'clay_settings')
+    logger.configure(
+        level=settings.get('log_level', 'clay_settings') or DEFAULT_LOG_LEVEL,
+        max_records=settings.get('log_max_records', 'clay_settings') or DEFAULT_MAX_RECORDS,
+        log_format=settings.get('log_format', 'clay_settings'),
+        max_file_size=None if log_max_size_mb is None else log_max_size_mb * MEGABYTE,
+        max_file_age=None if log_rotate_hours is None else log_rotate_hours * 60 * 60,
+        backups=settings.get('log_backups', 'clay_settings')
+    )
+
+
 def main():
     """
     Application entrypoint.
@@ -388,6 +429,10 @@ def main():
        and not args.without_x_keybinds:
         player.enable_xorg_bindings()
 
+    _configure_logging()
+
+    api_metrics.set_export_path(settings.get('metrics_file', 'clay_settings'))
+
     # Create a 256 colour palette.
     palette = [(name, '', '', '', res['foreground'], res['background'])
                for name, res in settings.colours_config.items()]
@@ -401,6 +446,7 @@ def main():
 
     # Run the actual program
     app_widget = AppWidget()
+    ipc_server.start()
     loop = urwid.MainLoop(app_widget, palette)
     app_widget.set_loop(loop)
     loop.screen.set_terminal_properties(256)
@@ -0,0 +1,228 @@
+"""
+Size-bounded file cache with LRU eviction.
+"""
+# pylint: disable=broad-except
+from threading import Lock
+import json
+import os
+import time
+
+from clay.log import logger
+
+POOL_AUDIO = 'audio'
+POOL_ART = 'art'
+
+POOL_EXTENSIONS = {
+    '.mp3': POOL_AUDIO,
+    '.jpg': POOL_ART,
+}
+
+
+class CacheManager(object):
+    """
+    Keeps track of cached files, their sizes & access times.
+
+    Files are split into pools (:attr:`.POOL_AUDIO` & :attr:`.POOL_ART`) by their extension,
+    each pool has its own byte budget. Once a pool exceeds its budget,
+    least recently used files are removed.
+
+    Metadata is persisted into an index file, so cache directory
+    doesn't need to be listed on every start.
+
+    Pinned files (see :meth:`.set_pinned`) are never evicted.
+    """
+    VERSION = 1
+    INDEX_FILENAME = 'cache-index.json'
+    INDEX_SAVE_INTERVAL = 30
+
+    def __init__(self, cache_dir, budgets):
+        self.cache_dir = cache_dir
+        self.budgets = budgets
+        self._index_path = os.path.join(cache_dir, CacheManager.INDEX_FILENAME)
+        # filename -> [size, last access timestamp]
+        self._files = {}
+        self._pool_sizes = {pool: 0 for pool in POOL_EXTENSIONS.values()}
+        self._pinned = frozenset()
+        self._is_dirty = False
+        self._last_save = 0
+        self._lock = Lock()
+
+        if not self._load_index():
+            self._scan()
+
+    @staticmethod
+    def get_pool(filename):
+        """
+        Return pool name for *filename* or ``None`` if file is not managed by cache.
+        """
+        return POOL_EXTENSIONS.get(os.path.splitext(filename)[1])
+
+    def _load_index(self):
+        """
+        Read index file. Return ``False`` if index is missing or unusable.
+        """
+        if not os.path.exists(self._index_path):
+            return False
+        try:
+            with open(self._index_path, 'r') as index_file:
+                data = json.load(index_file)
+        except Exception as error:
+            logger.error('Failed to read cache index: %s', repr(error))
+            return False
+        if data.get('version') != CacheManager.VERSION:
+            return False
+        for filename, (size, last_access) in data['files'].items():
+            self._add(filename, size, last_access)
+        return True
+
+    def _scan(self):
+        """
+        Build index by listing cache directory.
+        """
+        logger.debug('Building cache index from %s', self.cache_dir)
+        now = time.time()
+        for filename in os.listdir(self.cache_dir):
+            if self.get_pool(filename) is None:
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            self._add(filename, stat.st_size, stat.st_atime or now)
+        self._is_dirty = True
+        self.flush()
+
+    def _add(self, filename, size, last_access):
+        """
+        Add file to index.
+        """
+        pool = self.get_pool(filename)
+        if pool is None:
+            return
+        if filename in self._files:
+            self._pool_sizes[pool] -= self._files[filename][0]
+        self._files[filename] = [size, last_access]
+        self._pool_sizes[pool] += size
+
+    def _discard(self, filename):
+        """
+        Remove file from index.
+        """
+        size, _ = self._files.pop(filename)
+        self._pool_sizes[self.get_pool(filename)] -= size
+
+    def flush(self):
+        """
+        Write index file atomically if it has changed.
+        """
+        with self._lock:
+            if not self._is_dirty:
+                return
+            data = dict(version=CacheManager.VERSION, files=self._files)
+            temp_path = self._index_path + '.tmp'
+            try:
+                with open(temp_path, 'w') as index_file:
+                    json.dump(data, index_file, separators=(',', ':'))
+                os.rename(temp_path, self._index_path)
+            except Exception as error:
+                logger.error('Failed to write cache index: %s', repr(error))
+                return
+            self._is_dirty = False
+            self._last_save = time.time()
+
+    def _save_later(self):
+        """
+        Mark index as changed & write it if it was not written for a while.
+        """
+        self._is_dirty = True
+        if time.time() - self._last_save > CacheManager.INDEX_SAVE_INTERVAL:
+            self.flush()
+
+    def contains(self, filename):
+        """
+        Return ``True`` if *filename* is cached.
+        """
+        return filename in self._files
+
+    def get_path(self, filename):
+        """
+        Return full path to cached file & mark it as recently used.
+        Return ``None`` if file is not cached.
+        """
+        with self._lock:
+            if filename not in self._files:
+                return None
+            path = os.path.join(self.cache_dir, filename)
+            if not os.path.exists(path):
+                self._discard(filename)
+                path = None
+            else:
+                self._files[filename][1] = time.time()
+        self._save_later()
+        return path
+
+    def register(self, filename):
+        """
+        Add a file that was just written into cache directory to index
+        & evict old files if pool exceeds its budget.
+        """
+        path = os.path.join(self.cache_dir, filename)
+        with self._lock:
+            self._add(filename, os.path.getsize(path), time.time())
+            self._evict(self.get_pool(filename), filename)
+        self._save_later()
+        return path
+
+    def _evict(self, pool, keep_filename):
+        """
+        Remove least recently used files from *pool* until it fits its budget.
+        """
+        budget = self.budgets.get(pool)
+        if not budget or self._pool_sizes[pool] <= budget:
+            return
+        candidates = sorted(
+            (
+                (last_access, filename)
+                for filename, (_, last_access)
+                in self._files.items()
+                if filename != keep_filename and
+                self.get_pool(filename) == pool and
+                filename not in self._pinned
+            )
+        )
+        for _, filename in candidates:
+            if self._pool_sizes[pool] <= budget:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, filename))
+            except OSError as error:
+                logger.error('Failed to evict %s from cache: %s', filename, repr(error))
+            self._discard(filename)
+            logger.debug('Evicted %s from cache', filename)
+
+    def get_stats(self):
+        """
+        Return a dict of pool names & their sizes in bytes.
+        """
+        with self._lock:
+            return dict(self._pool_sizes)
+
+    def set_pinned(self, filenames):
+        """
+        Protect *filenames* from eviction (replaces previously pinned files.)
+        """
+        with self._lock:
+            self._pinned = frozenset(filenames)
+
+    def get_pinned_size(self, pool):
+        """
+        Return total size in bytes of pinned files in *pool* that are present in cache.
+        """
+        with self._lock:
+            return sum(
+                self._files[filename][0]
+                for filename
+                in self._pinned
+                if filename in self._files and self.get_pool(filename) == pool
+            )
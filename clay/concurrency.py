@@ -0,0 +1,221 @@
+"""
+Decorators for running functions asynchronously and for coordinating concurrent calls.
+"""
+# pylint: disable=broad-except
+from threading import Lock, Event
+
+from clay.workers import worker_pool, PRIORITY_INTERACTIVE
+
+
+def asynchronous(func, priority=PRIORITY_INTERACTIVE):
+    """
+    Decorates a function to become asynchronous.
+
+    Once called, runs original function on a thread from :attr:`clay.workers.worker_pool`.
+    Calls with lower *priority* value are run first.
+
+    Must be called with a 'callback' argument that will be called
+    once thread with original function finishes. Receives two args:
+    result and error.
+
+    - "result" contains function return value or None if there was an exception.
+    - "error" contains None or Exception if there was one.
+    """
+    def wrapper(*args, **kwargs):
+        """
+        Inner function.
+        """
+        callback = kwargs.pop('callback')
+        extra = kwargs.pop('extra', dict())
+
+        def process():
+            """
+            Task body.
+            """
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                callback(None, error, **extra)
+            else:
+                callback(result, None, **extra)
+
+        worker_pool.submit(priority, process)
+
+    return wrapper
+
+
+class _KeyedLock(object):
+    """
+    Set of locks, one per key.
+
+    Locks are created on first use and dropped once no thread holds or waits for them.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        # key -> [lock, number of threads holding or waiting for it]
+        self._locks = {}
+
+    def acquire(self, key):
+        """
+        Acquire lock of *key*.
+        """
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [Lock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+
+    def release(self, key):
+        """
+        Release lock of *key*.
+        """
+        with self._lock:
+            entry = self._locks[key]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+        entry[0].release()
+
+
+def synchronized(func=None, key=None):
+    """
+    Decorates a function to become thread-safe by preventing
+    it from being executed multiple times before previous calls end.
+
+    Lock is acquired on entrance and is released on return or Exception.
+
+    If *key* is given, it is called with the same arguments as decorated function
+    and only calls with equal keys block each other, e.g.
+    ``@synchronized(key=lambda track: track.store_id)``.
+    """
+    if func is None:
+        return lambda func: synchronized(func, key)
+
+    if key is None:
+        lock = Lock()
+
+        def wrapper(*args, **kwargs):
+            """
+            Inner function.
+            """
+            try:
+                lock.acquire()
+                return func(*args, **kwargs)
+            finally:
+                lock.release()
+
+        return wrapper
+
+    locks = _KeyedLock()
+
+    def keyed_wrapper(*args, **kwargs):
+        """
+        Inner function.
+        """
+        lock_key = key(*args, **kwargs)
+        locks.acquire(lock_key)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            locks.release(lock_key)
+
+    return keyed_wrapper
+
+
+class _Flight(object):
+    """
+    Call in progress that other callers can wait for.
+    """
+    __slots__ = ['finished', 'result', 'error', 'progress', 'listeners', 'lock']
+
+    def __init__(self):
+        self.finished = Event()
+        self.result = None
+        self.error = None
+        # Arguments of the latest progress report & callbacks that receive reports
+        self.progress = None
+        self.listeners = []
+        self.lock = Lock()
+
+    def listen(self, callback):
+        """
+        Pass progress reports of the call to *callback*, starting with the latest one.
+        """
+        with self.lock:
+            self.listeners.append(callback)
+            if self.progress is not None:
+                callback(*self.progress)
+
+    def report(self, *args):
+        """
+        Pass progress report to all listeners.
+        """
+        with self.lock:
+            self.progress = args
+            for callback in self.listeners:
+                callback(*args)
+
+    def wait(self):
+        """
+        Return result of the call or raise its exception.
+        """
+        self.finished.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def single_flight(key, progress=None):
+    """
+    Decorates a function so that concurrent calls with equal keys share one execution:
+    calls made while a call with the same key is running wait for it
+    and receive its result (or its exception.)
+
+    *key* is called with the same arguments as decorated function.
+
+    If *progress* is given, it is the name of keyword argument that takes a progress callback.
+    Callbacks of all calls that share an execution receive its progress reports,
+    callbacks of calls that join later start with the latest report.
+    """
+    def decorator(func):
+        """
+        Decorator.
+        """
+        lock = Lock()
+        flights = {}
+
+        def wrapper(*args, **kwargs):
+            """
+            Inner function.
+            """
+            flight_key = key(*args, **kwargs)
+            callback = kwargs.pop(progress, None) if progress is not None else None
+            with lock:
+                flight = flights.get(flight_key)
+                if flight is not None:
+                    is_leader = False
+                else:
+                    is_leader = True
+                    flight = flights[flight_key] = _Flight()
+            if callback is not None:
+                flight.listen(callback)
+            if not is_leader:
+                return flight.wait()
+
+            if progress is not None:
+                kwargs[progress] = flight.report
+            try:
+                flight.result = func(*args, **kwargs)
+            except Exception as error:
+                flight.error = error
+                raise
+            finally:
+                with lock:
+                    del flights[flight_key]
+                flight.finished.set()
+            return flight.result
+
+        return wrapper
+
+    return decorator
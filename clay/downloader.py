@@ -0,0 +1,250 @@
+"""
+Shared HTTP downloader for audio & artwork.
+"""
+# pylint: disable=broad-except
+from collections import deque
+from threading import Lock
+from io import BytesIO
+import os
+import time
+
+import requests
+
+from clay.log import logger
+from clay.settings import settings
+
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 8
+CHUNK_SIZE = 64 * 1024
+# Number of seconds used to estimate current download rate
+RATE_WINDOW = 5
+HTTP_PARTIAL_CONTENT = 206
+HTTP_RANGE_NOT_SATISFIABLE = 416
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class IncompleteDownloadError(Exception):
+    """
+    Raised when response ends before all announced bytes are received.
+    """
+
+
+class _Downloader(object):
+    """
+    Downloads files over HTTP(S).
+
+    Requests are made with a shared ``requests.Session`` (the one of gmusicapi client
+    once :meth:`.set_session_provider` is called), so connections are kept alive
+    in per-host pools and reused between downloads.
+
+    Responses are streamed in chunks, interrupted downloads are resumed
+    with HTTP Range requests and failed requests are retried with exponential backoff.
+
+    Singleton.
+    """
+    def __init__(self):
+        self.connect_timeout = (
+            settings.get('download_connect_timeout', 'clay_settings') or DEFAULT_CONNECT_TIMEOUT
+        )
+        self.read_timeout = (
+            settings.get('download_read_timeout', 'clay_settings') or DEFAULT_READ_TIMEOUT
+        )
+        retries = settings.get('download_retries', 'clay_settings')
+        self.retries = DEFAULT_RETRIES if retries is None else retries
+
+        self._get_session = None
+        self._own_session = None
+
+        self._lock = Lock()
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+        self._active = 0
+        self._bytes = 0
+        # (timestamp, size) of chunks received during last RATE_WINDOW seconds
+        self._recent_chunks = deque()
+
+    def set_session_provider(self, get_session):
+        """
+        Make requests with session returned by *get_session*
+        (e.g. session of gmusicapi client, which is replaced on logout.)
+        """
+        self._get_session = get_session
+
+    def _get_http_session(self):
+        """
+        Return session to make requests with.
+        """
+        session = self._get_session() if self._get_session is not None else None
+        if session is not None:
+            return session
+        if self._own_session is None:
+            self._own_session = requests.Session()
+        return self._own_session
+
+    def fetch(self, url):
+        """
+        Return content of *url*.
+        """
+        target = BytesIO()
+        self._download(url, target)
+        return target.getvalue()
+
+    def download(self, url, path, on_progress=None):
+        """
+        Download *url* into file at *path*.
+
+        If file already exists, it is treated as a partial download and is resumed.
+        If *on_progress* is given, it is called with number of bytes in file
+        and expected file size (``None`` if unknown) whenever data is flushed to file.
+        """
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as target:
+            target.seek(0, os.SEEK_END)
+            self._download(url, target, on_progress)
+
+    def _download(self, url, target, on_progress=None):
+        """
+        Write content of *url* into file object *target*, resuming from its current position.
+        """
+        with self._lock:
+            self._active += 1
+        try:
+            attempt = 0
+            while True:
+                try:
+                    self._download_once(url, target, on_progress)
+                    return
+                except Exception as error:
+                    if attempt >= self.retries or not self._is_retryable(error):
+                        raise
+                    delay = min(RETRY_BACKOFF * 2 ** attempt, RETRY_BACKOFF_MAX)
+                    attempt += 1
+                    logger.debug(
+                        'Download of %s failed: %s, retry %s in %ss',
+                        url, repr(error), attempt, delay
+                    )
+                    with self._lock:
+                        self._retries += 1
+                    time.sleep(delay)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _download_once(self, url, target, on_progress=None):
+        """
+        Make a single request & write response into *target* in chunks.
+        """
+        offset = target.tell()
+        headers = {'Range': 'bytes={}-'.format(offset)} if offset else {}
+        with self._lock:
+            self._requests += 1
+        response = self._get_http_session().get(
+            url,
+            headers=headers,
+            stream=True,
+            timeout=(self.connect_timeout, self.read_timeout)
+        )
+        try:
+            if offset and response.status_code == HTTP_RANGE_NOT_SATISFIABLE:
+                # Partial data is broken, start over
+                target.seek(0)
+                target.truncate()
+                response.close()
+                self._download_once(url, target, on_progress)
+                return
+            response.raise_for_status()
+            if response.status_code != HTTP_PARTIAL_CONTENT:
+                # Server may ignore range & send the whole file
+                target.seek(0)
+                target.truncate()
+            expected_size = self._get_expected_size(response, target.tell())
+            if on_progress is not None:
+                on_progress(target.tell(), expected_size)
+            for chunk in response.iter_content(CHUNK_SIZE):
+                target.write(chunk)
+                self._account(len(chunk))
+                if on_progress is not None:
+                    target.flush()
+                    on_progress(target.tell(), expected_size)
+            if expected_size is not None and target.tell() != expected_size:
+                raise IncompleteDownloadError(
+                    'received {} of {} bytes'.format(target.tell(), expected_size)
+                )
+        finally:
+            response.close()
+
+    @staticmethod
+    def _get_expected_size(response, offset):
+        """
+        Return total size of file that *response* delivers starting at *offset*,
+        ``None`` if it is unknown.
+        """
+        if response.headers.get('Content-Encoding', 'identity') != 'identity':
+            # Content-Length is the size of encoded data
+            return None
+        content_range = response.headers.get('Content-Range', '')
+        total = content_range.rpartition('/')[2]
+        if response.status_code == HTTP_PARTIAL_CONTENT and total.isdigit():
+            return int(total)
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit():
+            return offset + int(content_length)
+        return None
+
+    @staticmethod
+    def _is_retryable(error):
+        """
+        Return ``True`` if request that failed with *error* may succeed if repeated.
+        """
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and \
+                error.response.status_code in RETRY_STATUSES
+        return isinstance(error, (
+            IncompleteDownloadError,
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError
+        ))
+
+    def _account(self, size):
+        """
+        Account a received chunk of *size* bytes.
+        """
+        now = time.time()
+        with self._lock:
+            self._bytes += size
+            self._recent_chunks.append((now, size))
+            while self._recent_chunks[0][0] < now - RATE_WINDOW:
+                self._recent_chunks.popleft()
+
+    def get_stats(self):
+        """
+        Return a dict with number of active downloads, made requests, retries & failures,
+        total downloaded bytes and current download rate (bytes per second.)
+        """
+        now = time.time()
+        with self._lock:
+            recent_bytes = sum(
+                size
+                for timestamp, size
+                in self._recent_chunks
+                if timestamp >= now - RATE_WINDOW
+            )
+            return dict(
+                active=self._active,
+                requests=self._requests,
+                retries=self._retries,
+                failures=self._failures,
+                bytes=self._bytes,
+                rate=recent_bytes // RATE_WINDOW
+            )
+
+
+downloader = _Downloader()  # pylint: disable=invalid-name
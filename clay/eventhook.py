@@ -1,14 +1,129 @@
 """
 Events implemetation for signal handling.
 """
+# pylint: disable=broad-except
+from threading import Lock, Event, current_thread
+import os
+
+
+class _UIDispatcher(object):
+    """
+    Delivers calls of UI handlers (see :meth:`.EventHook.add_ui_handler`)
+    on urwid main loop thread.
+
+    Calls made from other threads are queued and delivered in a batch
+    once main loop wakes up.
+
+    Singleton.
+    """
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pipe = None
+        self._lock = Lock()
+        self._pending = []
+        # (hook, handler) -> pending call for collapsing hooks
+        self._pending_by_key = {}
+
+    def set_loop(self, loop):
+        """
+        Start delivering calls on *loop*. Must be called on main loop thread.
+        Until then all handlers are called right away.
+        """
+        self._loop = loop
+        self._thread = current_thread()
+        self._pipe = loop.watch_pipe(self._deliver)
+
+    def call(self, hook, handler, args, kwargs):
+        """
+        Call *handler* on main loop thread.
+        """
+        if self._loop is None or current_thread() is self._thread:
+            handler(*args, **kwargs)
+            return
+
+        with self._lock:
+            key = (hook, handler)
+            pending_call = self._pending_by_key.get(key)
+            if pending_call is not None and self._pending[-1] is pending_call:
+                # Collapse: only the latest state matters.
+                # Calls with others queued after them are kept to preserve ordering.
+                pending_call[2] = args
+                pending_call[3] = kwargs
+                return
+            pending_call = [hook, handler, args, kwargs]
+            if hook.collapse:
+                self._pending_by_key[key] = pending_call
+            self._pending.append(pending_call)
+            is_first = len(self._pending) == 1
+        if is_first:
+            os.write(self._pipe, b'.')
+
+    def run(self, func, *args):
+        """
+        Call *func* on main loop thread, wait for it to finish
+        and return its result (or raise its exception.)
+        """
+        if self._loop is None or current_thread() is self._thread:
+            return func(*args)
+
+        finished = Event()
+        outcome = {}
+
+        def run():
+            """
+            Call *func* and store its outcome.
+            """
+            try:
+                outcome['result'] = func(*args)
+            except Exception as error:
+                outcome['error'] = error
+            finally:
+                finished.set()
+
+        with self._lock:
+            self._pending.append([None, run, (), {}])
+            is_first = len(self._pending) == 1
+        if is_first:
+            os.write(self._pipe, b'.')
+        finished.wait()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def _deliver(self, _):
+        """
+        Run all pending calls. Called on main loop thread.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._pending_by_key = {}
+        for _, handler, args, kwargs in pending:
+            try:
+                handler(*args, **kwargs)
+            except Exception as error:
+                from clay.log import logger  # pylint: disable=cyclic-import
+                logger.error('Event handler %s failed: %s', handler, repr(error))
+        return True
+
+
+ui_dispatcher = _UIDispatcher()  # pylint: disable=invalid-name
 
 
 class EventHook(object):
     """
     Event that can have handlers attached.
+
+    Handlers added with :meth:`.add_ui_handler` are always run on urwid main loop thread.
+    If *collapse* is ``True``, repeated events that are waiting to be delivered
+    to UI handlers are merged into one (with arguments of the latest event)
+    unless other calls were queued in between.
     """
-    def __init__(self):
+    def __init__(self, collapse=False):
         self.event_handlers = []
+        self.ui_handlers = []
+        self.collapse = collapse
 
     def __iadd__(self, handler):
         """
@@ -22,11 +137,23 @@ class EventHook(object):
         Remove event handler.
         """
         self.event_handlers.remove(handler)
+        if handler in self.ui_handlers:
+            self.ui_handlers.remove(handler)
         return self
 
+    def add_ui_handler(self, handler):
+        """
+        Add event handler that touches widgets and must be called on main loop thread.
+        """
+        self.event_handlers.append(handler)
+        self.ui_handlers.append(handler)
+
     def fire(self, *args, **kwargs):
         """
         Execute all handlers.
         """
         for handler in self.event_handlers:
-            handler(*args, **kwargs)
+            if handler in self.ui_handlers:
+                ui_dispatcher.call(self, handler, args, kwargs)
+            else:
+                handler(*args, **kwargs)
@@ -4,84 +4,36 @@ Google Play Music integration via gmusicapi.
 # pylint: disable=broad-except
 # pylint: disable=protected-access
 from __future__ import print_function
-try:  # Python 3.x
-    from urllib.request import urlopen
-except ImportError:  # Python 2.x
-    from urllib import urlopen
 try:
     from PIL import Image
 except ImportError:
     Image = None
-from io import BytesIO
 from hashlib import sha1
-from threading import Thread, Lock
+from io import BytesIO
 from uuid import UUID
 
 from gmusicapi.clients import Mobileclient
+from gmusicapi.protocol.mobileclient import ListTracks, ListPlaylists, \
+    ListPlaylistEntries, ListStations
 
+from clay.concurrency import asynchronous, synchronized, single_flight
+from clay.downloader import downloader
 from clay.eventhook import EventHook
 from clay.log import logger
+from clay.metrics import api_metrics
+from clay.paging import iter_pages, PlaylistBuilder
+from clay.replay import get_api_backend
+from clay.search import SearchIndex
 from clay.settings import settings
+from clay.snapshot import LibrarySnapshot
+from clay.urlcache import URLCache, get_url_expiry, is_url_fresh
+from clay.workers import worker_pool, \
+    PRIORITY_PLAYBACK, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
 
 STATION_FETCH_LEN = 50
+LIBRARY_SYNC_PAGE_LEN = 1000
 
-
-def asynchronous(func):
-    """
-    Decorates a function to become asynchronous.
-
-    Once called, runs original function in a new Thread.
-
-    Must be called with a 'callback' argument that will be called
-    once thread with original function finishes. Receives two args:
-    result and error.
-
-    - "result" contains function return value or None if there was an exception.
-    - "error" contains None or Exception if there was one.
-    """
-    def wrapper(*args, **kwargs):
-        """
-        Inner function.
-        """
-        callback = kwargs.pop('callback')
-        extra = kwargs.pop('extra', dict())
-
-        def process():
-            """
-            Thread body.
-            """
-            try:
-                result = func(*args, **kwargs)
-            except Exception as error:
-                callback(None, error, **extra)
-            else:
-                callback(result, None, **extra)
-
-        Thread(target=process).start()
-
-    return wrapper
-
-
-def synchronized(func):
-    """
-    Decorates a function to become thread-safe by preventing
-    it from being executed multiple times before previous calls end.
-
-    Lock is acquired on entrance and is released on return or Exception.
-    """
-    lock = Lock()
-
-    def wrapper(*args, **kwargs):
-        """
-        Inner function.
-        """
-        try:
-            lock.acquire()
-            return func(*args, **kwargs)
-        finally:
-            lock.release()
-
-    return wrapper
+_NOT_PARSED = object()
 
 
 class Track(object):
@@ -96,6 +48,26 @@ class Track(object):
     SOURCE_PLAYLIST = 'playlist'
     SOURCE_SEARCH = 'search'
 
+    __slots__ = (
+        'store_id',
+        'playlist_item_id',
+        'library_id',
+        'track_type',
+        'title',
+        'artist',
+        'duration',
+        'rating',
+        'explicit_rating',
+        'album_name',
+        'last_rating_change',
+        'album_url',
+        'source',
+        'cached_url',
+        'cached_url_expires',
+        '_artist_art_refs',
+        '_artist_art_url',
+    )
+
     def __init__(self, source, data):
         # In playlist items and user uploaded songs the storeIds are missing so
         self.store_id = (data['storeId'] if 'storeId' in data else data.get('id'))
@@ -107,28 +79,24 @@ class Track(object):
             data = data['track']
             self.store_id = data['storeId']
 
-        artist_art_ref = next(iter(sorted(
-            [
-                ref
-                for ref
-                in data.get('artistArtRef', [])
-            ],
-            key=lambda x: x['aspectRatio']
-        )), None)
+        self.track_type = data.get('trackType')
         self.title = data['title']
         self.artist = data['artist']
         self.duration = int(data['durationMillis'])
         self.rating = (int(data['rating']) if 'rating' in data else 0)
         self.source = source
         self.cached_url = None
-        self.artist_art_url = None
-        self.artist_art_filename = None
-        if artist_art_ref is not None:
-            self.artist_art_url = artist_art_ref['url']
-            self.artist_art_filename = sha1(
-                self.artist_art_url.encode('utf-8')
-            ).hexdigest() + u'.jpg'
+        self.cached_url_expires = 0
         self.explicit_rating = (int(data['explicitType']))
+        self.last_rating_change = data.get('lastRatingChangeTimestamp', '0')
+
+        # Artist art is picked on first access, most tracks never have their art shown
+        self._artist_art_refs = tuple(
+            (ref['aspectRatio'], ref['url'])
+            for ref
+            in data.get('artistArtRef', [])
+        )
+        self._artist_art_url = _NOT_PARSED
 
         if self.rating == 5:
             gp.cached_liked_songs.add_liked_song(self)
@@ -137,7 +105,28 @@ class Track(object):
         self.album_name = data['album']
         self.album_url = (data['albumArtRef'][0]['url'] if 'albumArtRef' in data else "")
 
-        self.original_data = data
+    @property
+    def artist_art_url(self):
+        """
+        Return URL of artist art with the smallest aspect ratio, ``None`` if there is none.
+        """
+        if self._artist_art_url is _NOT_PARSED:
+            artist_art_ref = next(iter(sorted(
+                self._artist_art_refs,
+                key=lambda x: x[0]
+            )), None)
+            self._artist_art_url = (artist_art_ref[1] if artist_art_ref is not None else None)
+            self._artist_art_refs = None
+        return self._artist_art_url
+
+    @property
+    def artist_art_filename(self):
+        """
+        Return cache filename for artist art, ``None`` if there is no artist art.
+        """
+        if self.artist_art_url is None:
+            return None
+        return sha1(self.artist_art_url.encode('utf-8')).hexdigest() + u'.jpg'
 
     @property
     def id(self):  # pylint: disable=invalid-name
@@ -208,39 +197,66 @@ class Track(object):
         """
         gp.increment_song_playcount_async(self.id, callback=lambda id_, error: callback(id_, error) if callback else None)
 
-    def get_url(self, callback):
+    @property
+    def has_fresh_url(self):
+        """
+        Return ``True`` if :attr:`.cached_url` is known to stay valid for a while.
+        """
+        return (
+            self.cached_url is not None and
+            is_url_fresh(self.cached_url_expires)
+        )
+
+    def get_url(self, callback, prefetch=False):
         """
         Gets playable stream URL for this track.
 
         "callback" is called with "(url, error)" args after URL is fetched.
+        Cached URL is reused until it expires.
+
+        If *prefetch* is ``True``, request is run with background priority.
 
         Keep in mind this URL is valid for a limited time.
+
+        Callback is always called on a worker thread, even if URL is cached,
+        so it never runs inside caller's stack (e.g. a libVLC event callback.)
         """
+        priority = PRIORITY_BACKGROUND if prefetch else PRIORITY_PLAYBACK
+        if self.has_fresh_url:
+            worker_pool.submit(priority, callback, self.cached_url, None, self)
+            return
+
         def on_get_url(url, error):
             """
             Called when URL is fetched.
             """
             self.cached_url = url
+            self.cached_url_expires = (get_url_expiry(url) if url else 0)
             callback(url, error, self)
 
         if gp.is_subscribed:
             track_id = self.store_id
         else:
             track_id = self.library_id
-        gp.get_stream_url_async(track_id, callback=on_get_url)
+        if prefetch:
+            gp.prefetch_stream_url_async(track_id, callback=on_get_url)
+        else:
+            gp.get_stream_url_async(track_id, callback=on_get_url)
 
-    @synchronized
+    @synchronized(key=lambda track: track.artist_art_url)
     def get_artist_art_filename(self):
         """
         Return artist art filename, None if this track doesn't have any.
         Downloads if necessary.
+
+        Different artworks are downloaded in parallel, callers that request
+        artwork which is being downloaded wait for it and reuse the cached file.
         """
         if self.artist_art_url is None:
             return None
 
         if not settings.get_is_file_cached(self.artist_art_filename):
-            response = urlopen(self.artist_art_url)
-            data = response.read()
+            data = downloader.fetch(self.artist_art_url)
             if Image:
                 image = Image.open(BytesIO(data))
                 image.thumbnail((128, 128))
@@ -253,12 +269,13 @@ class Track(object):
 
     # get_artist_arg_filename_async = asynchronous(get_artist_art_filename)
 
-    @synchronized
+    @single_flight(key=lambda track: track.store_id)
     def create_station(self):
         """
         Creates a new station from this :class:`.Track`.
 
         Returns :class:`.Station` instance.
+        Concurrent requests for the same track share one station.
         """
         station_name = u'Station - {}'.format(self.title)
         station_id = gp.mobile_client.create_station(
@@ -291,8 +308,11 @@ class Track(object):
         """
         Rate the song either 0 (no thumb), 1 (down thumb) or 5 (up thumb).
         """
-        gp.mobile_client.rate_songs(self.original_data, rating)
-        self.original_data['rating'] = rating
+        if self.library_id:
+            song = {'id': str(self.library_id)}
+        else:
+            song = {'nid': self.store_id, 'trackType': self.track_type}
+        gp.mobile_client.rate_songs(song, rating)
         self.rating = rating
 
         if rating == 5:
@@ -440,21 +460,6 @@ class Playlist(object):
         """
         return self._id
 
-    @classmethod
-    def from_data(cls, data, many=False):
-        """
-        Construct and return one or many :class:`.Playlist` instances
-        from Google Play Music API response.
-        """
-        if many:
-            return [cls.from_data(one) for one in data]
-
-        return Playlist(
-            playlist_id=data['id'],
-            name=data['name'],
-            tracks=Track.from_data(data['tracks'], Track.SOURCE_PLAYLIST, many=True)
-        )
-
 
 class LikedSongs(object):
     """
@@ -468,6 +473,13 @@ class LikedSongs(object):
         self._tracks = []
         self._sorted = False
 
+    @property
+    def id(self):  # pylint: disable=invalid-name
+        """
+        Liked songs ID, always ``None`` as this playlist is not stored remotely.
+        """
+        return self._id
+
     @property
     def tracks(self):
         """
@@ -476,8 +488,7 @@ class LikedSongs(object):
         if self._sorted:
             tracks = self._tracks
         else:
-            self._tracks.sort(key=lambda k: k.original_data.get('lastRatingChangeTimestamp', '0'),
-                              reverse=True)
+            self._tracks.sort(key=lambda k: k.last_rating_change, reverse=True)
             self._sorted = True
             tracks = self._tracks
 
@@ -507,53 +518,73 @@ class _GP(object):
     caches_invalidated = EventHook()
 
     def __init__(self):
-        # self.is_debug = os.getenv('CLAY_DEBUG')
         self.mobile_client = Mobileclient()
         self.mobile_client._make_call = self._make_call_proxy(
-            self.mobile_client._make_call
+            api_metrics.wrap_call(get_api_backend(self.mobile_client._make_call))
+        )
+        self.mobile_client.session.send = api_metrics.wrap_send(
+            self.mobile_client.session.send
         )
-        # if self.is_debug:
-        #     self.debug_file = open('/tmp/clay-api-log.json', 'w')
-        #     self._last_call_index = 0
+        downloader.set_session_provider(lambda: self.mobile_client.session._rsession)
         self.cached_tracks = None
+        self.cached_tracks_map = {}
+        self._cached_tracks_index = {}
+        self._search_index = None
+        self._stream_urls = URLCache()
         self.cached_liked_songs = LikedSongs()
         self.cached_playlists = None
         self.cached_stations = None
+        self._account = None
+        self.library_snapshot = LibrarySnapshot.for_account(settings.get_cache_dir(), None)
 
         self.invalidate_caches()
 
         self.auth_state_changed = EventHook()
+        self.library_synced = EventHook()
+        # Fired with (playlists, is_complete) as playlists are being loaded.
+        self.playlists_updated = EventHook(collapse=True)
+        # Fired with (stations, is_complete) as stations are being loaded.
+        self.stations_updated = EventHook(collapse=True)
 
-    def _make_call_proxy(self, func):
+    @staticmethod
+    def _make_call_proxy(func):
         """
-        Return a function that wraps *fn* and logs args & return values.
+        Return a function that wraps *fn* and logs args.
         """
         def _make_call(protocol, *args, **kwargs):
             """
             Wrapper function.
             """
-            logger.debug('GP::{}(*{}, **{})'.format(
-                protocol.__name__,
-                args,
-                kwargs
-            ))
-            result = func(protocol, *args, **kwargs)
-            # self._last_call_index += 1
-            # call_index = self._last_call_index
-            # self.debug_file.write(json.dumps([
-            #     call_index,
-            #     protocol.__name__, args, kwargs,
-            #     result
-            # ]) + '\n')
-            # self.debug_file.flush()
-            return result
+            logger.debug('GP::%s(*%s, **%s)', protocol.__name__, args, kwargs)
+            return func(protocol, *args, **kwargs)
         return _make_call
 
-    def invalidate_caches(self):
+    def _set_account(self, account):
         """
-        Clear cached tracks & playlists & stations.
+        Switch library caches to *account*.
+
+        Library of previously used account is dropped from memory,
+        so that changes of one account are never merged into library of another one.
         """
+        account = account.lower() if account else None
+        if account == self._account:
+            return
+        self._account = account
         self.cached_tracks = None
+        self.cached_tracks_map = {}
+        self._cached_tracks_index = {}
+        self._search_index = None
+        self.cached_liked_songs = LikedSongs()
+        self.library_snapshot = LibrarySnapshot.for_account(settings.get_cache_dir(), account)
+
+    def invalidate_caches(self):
+        """
+        Clear cached playlists & stations and mark library snapshot as stale.
+
+        Cached tracks are kept and are synced with the server
+        on next :meth:`.get_all_tracks` call.
+        """
+        self.library_snapshot.mark_stale()
         self.cached_playlists = None
         self.cached_stations = None
         self.caches_invalidated.fire()
@@ -564,7 +595,9 @@ class _GP(object):
         Log in into Google Play Music.
         """
         self.mobile_client.logout()
+        self._set_account(email or device_id)
         self.invalidate_caches()
+        self._stream_urls.clear()
         # prev_auth_state = self.is_authenticated
         result = self.mobile_client.login(email, password, device_id)
         # if prev_auth_state != self.is_authenticated:
@@ -574,11 +607,12 @@ class _GP(object):
     login_async = asynchronous(login)
 
     @synchronized
-    def use_authtoken(self, authtoken, device_id):
+    def use_authtoken(self, authtoken, device_id, email=None):
         """
-        Try to use cached token to log into Google Play Music.
+        Try to use cached token (of account with *email*) to log into Google Play Music.
         """
         # pylint: disable=protected-access
+        self._set_account(email or device_id)
         self.mobile_client.session._authtoken = authtoken
         self.mobile_client.session.is_authenticated = True
         self.mobile_client.android_id = device_id
@@ -607,23 +641,177 @@ class _GP(object):
         Cache and return all tracks from "My library".
 
         Each track will have "id" and "storeId" keys.
+
+        If library snapshot is available on disk, tracks are returned from it right away
+        and changes are fetched in background (see :meth:`.sync_library`.)
         """
-        if self.cached_tracks:
+        if self.cached_tracks is not None:
+            if self.library_snapshot.is_stale:
+                self.sync_library()
             return self.cached_tracks
-        data = self.mobile_client.get_all_songs()
-        self.cached_tracks = Track.from_data(data, Track.SOURCE_LIBRARY, True)
 
+        if self.library_snapshot.load():
+            self.cached_tracks = self._build_library_tracks(self.library_snapshot.get_items())
+            self.sync_library_async(callback=self._on_library_synced)
+            return self.cached_tracks
+
+        self.sync_library()
         return self.cached_tracks
 
     get_all_tracks_async = asynchronous(get_all_tracks)
 
+    @synchronized
+    def sync_library(self):
+        """
+        Fetch library changes since last sync, merge them into library snapshot
+        and rebuild cached tracks.
+
+        Performs full fetch if snapshot is empty.
+
+        Return ``True`` if library has changed.
+        """
+        snapshot = self.library_snapshot
+        snapshot.load()
+        if snapshot.is_empty:
+            snapshot.replace(self.mobile_client.get_all_songs())
+            changed_ids = None
+        else:
+            changed_ids = snapshot.merge(self._get_library_changes(snapshot.updated_after))
+            if not changed_ids and self.cached_tracks is not None:
+                return False
+
+        self.cached_tracks = self._build_library_tracks(snapshot.get_items(), changed_ids)
+        snapshot.save()
+        return True
+
+    sync_library_async = asynchronous(sync_library, PRIORITY_BACKGROUND)
+
+    def _on_library_synced(self, changed, error):
+        """
+        Called when background library sync finishes.
+        Fires :attr:`.library_synced` event if library has changed.
+        """
+        if error:
+            logger.error('Failed to sync library: %s', repr(error))
+            return
+        if changed:
+            self.library_synced.fire(self.cached_tracks)
+
+    def _get_library_changes(self, updated_after):
+        """
+        Return a list of library track data (including deleted tracks)
+        that was modified after *updated_after*.
+        """
+        return [
+            item
+            for items
+            in iter_pages(
+                self.mobile_client._make_call, ListTracks, updated_after,
+                include_deleted=True, page_len=LIBRARY_SYNC_PAGE_LEN
+            )
+            for item
+            in items
+        ]
+
+    def _build_library_tracks(self, items, changed_ids=None):
+        """
+        Construct library :class:`.Track` instances from track data.
+
+        Tracks that are already cached are reused unless their IDs are in *changed_ids*
+        (all tracks are rebuilt if *changed_ids* is ``None``.)
+        """
+        existing = self._drop_changed_tracks(changed_ids)
+        tracks = []
+        for item in items:
+            track = existing.get(item['id'])
+            if track is None:
+                track = Track.from_data(item, Track.SOURCE_LIBRARY)
+                if track is not None:
+                    self._index_track(track)
+            if track is not None:
+                tracks.append(track)
+        worker_pool.submit(PRIORITY_BACKGROUND, self.update_search_index, tracks)
+        return tracks
+
+    def _drop_changed_tracks(self, changed_ids):
+        """
+        Remove cached tracks with IDs in *changed_ids* (all tracks if it is ``None``)
+        from lookup indexes & liked songs. Return a dict of remaining tracks by library ID.
+        """
+        if changed_ids is None:
+            self.cached_tracks_map = {}
+            self._cached_tracks_index = {}
+
+        existing = {}
+        for track in self.cached_tracks or []:
+            if changed_ids is None or str(track.library_id) in changed_ids:
+                self._unindex_track(track)
+                if track.rating == 5:
+                    self.cached_liked_songs.remove_liked_song(track)
+            else:
+                existing[str(track.library_id)] = track
+        return existing
+
+    def _index_track(self, track):
+        """
+        Add library track to lookup indexes.
+        """
+        self.cached_tracks_map[track.id] = track
+        for key in (track.library_id, track.store_id, track.playlist_item_id):
+            if key is not None:
+                self._cached_tracks_index.setdefault(key, track)
+
+    def _unindex_track(self, track):
+        """
+        Remove library track from lookup indexes.
+        """
+        if self.cached_tracks_map.get(track.id) is track:
+            del self.cached_tracks_map[track.id]
+        for key in (track.library_id, track.store_id, track.playlist_item_id):
+            if key is not None and self._cached_tracks_index.get(key) is track:
+                del self._cached_tracks_index[key]
+
     def get_stream_url(self, stream_id):
         """
         Returns playable stream URL of track by id.
+
+        Resolved URLs are reused until they expire and concurrent requests
+        for the same stream share one API call.
+        """
+        url = self._stream_urls.get(stream_id)
+        if url is not None:
+            return url
+        return self._fetch_stream_url(stream_id)
+
+    get_stream_url_async = asynchronous(get_stream_url, PRIORITY_PLAYBACK)
+    prefetch_stream_url_async = asynchronous(get_stream_url, PRIORITY_BACKGROUND)
+
+    @single_flight(key=lambda self, stream_id: stream_id)
+    def _fetch_stream_url(self, stream_id):
+        """
+        Fetch stream URL and cache it if its expiry time is known.
         """
-        return self.mobile_client.get_stream_url(stream_id)
+        url = self.mobile_client.get_stream_url(stream_id)
+        self._stream_urls.put(stream_id, url)
+        return url
 
-    get_stream_url_async = asynchronous(get_stream_url)
+    @single_flight(key=lambda self, url, filename, on_progress=None: filename,
+                   progress='on_progress')
+    def save_stream_to_cache(self, url, filename, on_progress=None):
+        """
+        Download audio from *url* into a partial file and move it into cache
+        as *filename* once complete. Return path to cached file.
+
+        Partially downloaded files are resumed and concurrent downloads
+        of the same file share one request.
+        *on_progress* is passed to :meth:`clay.downloader._Downloader.download`,
+        callers that join a running download receive its progress too.
+        """
+        if settings.get_is_file_cached(filename):
+            # Download finished before this call has joined it
+            return settings.get_cached_file_path(filename)
+        downloader.download(url, settings.get_partial_file_path(filename), on_progress)
+        return settings.commit_partial_file(filename)
 
     def increment_song_playcount(self, track_id):
         """
@@ -632,22 +820,34 @@ class _GP(object):
         """
         return gp.mobile_client.increment_song_playcount(track_id)
 
-    increment_song_playcount_async = asynchronous(increment_song_playcount)
+    increment_song_playcount_async = asynchronous(
+        increment_song_playcount, PRIORITY_BACKGROUND
+    )
 
     @synchronized
     def get_all_user_station_contents(self, **_):
         """
-              Return list of :class:`.Station` instances.
-              """
-        if self.cached_stations:
+        Return list of :class:`.Station` instances.
+
+        Stations do not need library tracks, so library is not loaded.
+        Every fetched page is published with :attr:`.stations_updated` event.
+        """
+        if self.cached_stations is not None:
+            self.stations_updated.fire(self.cached_stations, True)
             return self.cached_stations
-        self.get_all_tracks()
 
-        self.cached_stations = Station.from_data(
-            self.mobile_client.get_all_stations(),
-            True
-        )
-        return self.cached_stations
+        stations = []
+        try:
+            for items in iter_pages(self.mobile_client._make_call, ListStations):
+                stations.extend(Station.from_data(items, True))
+                self.stations_updated.fire(list(stations), False)
+        except Exception:
+            self.stations_updated.fire(stations, True)
+            raise
+
+        self.cached_stations = stations
+        self.stations_updated.fire(stations, True)
+        return stations
 
     get_all_user_station_contents_async = (  # pylint: disable=invalid-name
         asynchronous(get_all_user_station_contents)
@@ -657,37 +857,70 @@ class _GP(object):
     def get_all_user_playlist_contents(self, **_):
         """
         Return list of :class:`.Playlist` instances.
-        """
-        if self.cached_playlists:
-            return [self.cached_liked_songs] + self.cached_playlists
 
-        self.get_all_tracks()
+        Library tracks, playlists and playlist entries are fetched concurrently.
+        Pages of entries are parsed on worker threads while next pages are downloading
+        and partial results are published with :attr:`.playlists_updated` event.
+        """
+        if self.cached_playlists is not None:
+            playlists = [self.cached_liked_songs] + self.cached_playlists
+            self.playlists_updated.fire(playlists, True)
+            return playlists
 
-        self.cached_playlists = Playlist.from_data(
-            self.mobile_client.get_all_user_playlist_contents(),
-            True
+        builder = PlaylistBuilder(
+            lambda entry: Track.from_data(entry, Track.SOURCE_PLAYLIST),
+            lambda playlists: self.playlists_updated.fire(
+                [self.cached_liked_songs] + playlists, False
+            )
         )
-        return [self.cached_liked_songs] + self.cached_playlists
+        try:
+            builder.load(
+                iter_pages(self.mobile_client._make_call, ListPlaylistEntries),
+                worker_pool.submit_task(PRIORITY_INTERACTIVE, self.get_all_tracks),
+                worker_pool.submit_task(PRIORITY_INTERACTIVE, self._get_user_playlists)
+            )
+        except Exception:
+            # Let running parsers finish, so that the last published result is final.
+            builder.wait(ignore_errors=True)
+            self.playlists_updated.fire([self.cached_liked_songs] + builder.playlists, True)
+            raise
+
+        self.cached_playlists = builder.playlists
+        playlists = [self.cached_liked_songs] + self.cached_playlists
+        self.playlists_updated.fire(playlists, True)
+        return playlists
 
     get_all_user_playlist_contents_async = (  # pylint: disable=invalid-name
         asynchronous(get_all_user_playlist_contents)
     )
 
+    def _get_user_playlists(self):
+        """
+        Return user playlists without entries. Shared playlists are skipped.
+        """
+        return [
+            Playlist(playlist_id=data['id'], name=data['name'], tracks=[])
+            for items
+            in iter_pages(self.mobile_client._make_call, ListPlaylists)
+            for data
+            in items
+            if data.get('type') != 'SHARED'
+        ]
+
     def get_cached_tracks_map(self):
         """
         Return a dictionary of tracks where keys are strings with track IDs
         and values are :class:`.Track` instances.
+
+        The dictionary is maintained along with cached tracks and must not be modified.
         """
-        return {track.id: track for track in self.cached_tracks}
+        return self.cached_tracks_map
 
     def get_track_by_id(self, any_id):
         """
         Return track by id or store_id.
         """
-        for track in self.cached_tracks:
-            if any_id in (track.library_id, track.store_id, track.playlist_item_id):
-                return track
-        return None
+        return self._cached_tracks_index.get(any_id)
 
     def search(self, query):
         """
@@ -698,6 +931,29 @@ class _GP(object):
 
     search_async = asynchronous(search)
 
+    def search_library(self, query):
+        """
+        Find cached library tracks by *query* without network requests.
+        Return list of :class:`.Track` instances, best matches first.
+
+        Search index is normally prepared in background once library is loaded
+        (see :meth:`.update_search_index`), otherwise it is built right away.
+        """
+        tracks = self.cached_tracks
+        if not tracks:
+            return []
+        return self.update_search_index(tracks).search(query)
+
+    def update_search_index(self, tracks):
+        """
+        Build search index for *tracks* unless it is already built.
+        """
+        search_index = self._search_index
+        if search_index is None or search_index.tracks is not tracks:
+            search_index = SearchIndex(tracks)
+            self._search_index = search_index
+        return search_index
+
     def add_to_my_library(self, track):
         """
         Add a track to my library.
@@ -713,6 +969,9 @@ class _GP(object):
         """
         result = self.mobile_client.delete_songs(track.id)
         if result:
+            library_track = self.get_track_by_id(track.id)
+            if library_track is not None:
+                self._unindex_track(library_track)
             self.invalidate_caches()
         return result
 
@@ -0,0 +1,289 @@
+"""
+Local control & status socket.
+
+Clients connect to a Unix domain socket and exchange JSON objects,
+one per line.
+
+Every client receives playback state updates::
+
+    {"event": "track_changed", "state": {...}}
+
+Clients can send commands::
+
+    {"command": "play_pause"}
+    {"command": "next"}
+    {"command": "prev"}
+    {"command": "seek", "position": 0.5}
+    {"command": "seek", "delta": -0.05}
+    {"command": "enqueue", "track_id": "..."}
+    {"command": "get_state"}
+    {"command": "get_metrics"}
+
+Each command is answered with ``{"reply": "<command>", "ok": true}``
+or ``{"reply": "<command>", "ok": false, "error": "..."}``.
+"""
+# pylint: disable=broad-except
+from threading import Thread, Lock
+from uuid import UUID
+import json
+import os
+import socket
+
+try:  # Python 3.x
+    from queue import Queue
+except ImportError:  # Python 2.x
+    from Queue import Queue
+
+from clay.eventhook import ui_dispatcher
+from clay.gp import gp
+from clay.log import logger
+from clay.metrics import api_metrics
+from clay.player import player
+from clay.settings import settings
+
+
+class _IPCClient(object):
+    """
+    Connected client.
+    """
+    def __init__(self, server, connection):
+        self.server = server
+        self.connection = connection
+        self._send_lock = Lock()
+
+    def send(self, message):
+        """
+        Send a message to client. Return ``False`` if client is gone.
+        """
+        data = (json.dumps(message) + '\n').encode('utf-8')
+        try:
+            with self._send_lock:
+                self.connection.sendall(data)
+        except socket.error:
+            return False
+        return True
+
+    def serve(self):
+        """
+        Read & execute commands until client disconnects.
+        """
+        stream = self.connection.makefile('rb')
+        try:
+            for line in stream:
+                line = line.strip()
+                if line:
+                    self.send(self.server.execute(line.decode('utf-8')))
+        except (socket.error, ValueError):
+            pass
+        finally:
+            stream.close()
+            self.server.disconnect(self)
+
+    def close(self):
+        """
+        Close connection.
+        """
+        try:
+            self.connection.close()
+        except socket.error:
+            pass
+
+
+class _IPCServer(object):
+    """
+    Unix domain socket server that pushes player state to clients
+    and accepts playback commands.
+
+    Singleton.
+    """
+    def __init__(self):
+        self.path = None
+        self._socket = None
+        self._clients = []
+        self._clients_lock = Lock()
+        self._events = Queue()
+        self._last_state = None
+        self._commands = dict(
+            play_pause=lambda _: player.play_pause(),
+            next=lambda _: player.next(True),
+            prev=lambda _: player.prev(True),
+            seek=self._seek,
+            enqueue=self._enqueue,
+            get_state=lambda _: player.get_state(),
+            get_metrics=lambda _: api_metrics.get_stats()
+        )
+
+    def start(self):
+        """
+        Start listening on socket from ``ipc_socket`` setting (if set).
+        IPC is disabled if socket can't be created.
+        """
+        self.path = settings.get('ipc_socket', 'clay_settings')
+        if not self.path:
+            return
+
+        try:
+            self._socket = self._listen()
+        except (socket.error, OSError) as error:
+            logger.error('Failed to create IPC socket %s, IPC is disabled: %s', self.path, error)
+            self._socket = None
+        if self._socket is None:
+            self.path = None
+            return
+
+        player.track_changed += lambda *_: self.push('track_changed')
+        player.media_state_changed += lambda *_: self.push('media_state_changed')
+        player.media_position_changed += lambda *_: self.push('media_position_changed')
+        player.queue_changed += lambda *_: self.push('queue_changed')
+
+        for target in (self._accept, self._send_events):
+            thread = Thread(target=target)
+            thread.daemon = True
+            thread.start()
+
+    def _listen(self):
+        """
+        Return socket that listens on :attr:`.path`.
+        Return ``None`` if socket is used by another process.
+        """
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except socket.error:
+                os.remove(self.path)
+            else:
+                logger.error('IPC socket %s is used by another process', self.path)
+                return None
+            finally:
+                probe.close()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(self.path)
+            listener.listen(5)
+        except (socket.error, OSError):
+            listener.close()
+            raise
+        return listener
+
+    def stop(self):
+        """
+        Disconnect clients and remove socket.
+        """
+        if self._socket is None:
+            return
+        self._socket.close()
+        self._socket = None
+        with self._clients_lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _accept(self):
+        """
+        Accept connections.
+        """
+        while self._socket is not None:
+            try:
+                connection, _ = self._socket.accept()
+            except (socket.error, AttributeError):
+                return
+            client = _IPCClient(self, connection)
+            with self._clients_lock:
+                self._clients.append(client)
+            thread = Thread(target=client.serve)
+            thread.daemon = True
+            thread.start()
+
+    def disconnect(self, client):
+        """
+        Forget disconnected client.
+        """
+        with self._clients_lock:
+            if client in self._clients:
+                self._clients.remove(client)
+        client.close()
+
+    def push(self, event):
+        """
+        Queue player state update for delivery to all clients.
+        """
+        if self._clients:
+            self._events.put(event)
+
+    def _send_events(self):
+        """
+        Deliver queued state updates. Runs on its own thread,
+        so slow clients never block player callbacks.
+        Position updates are sent only if state has actually changed.
+        """
+        while True:
+            event = self._events.get()
+            state = player.get_state()
+            if event == 'media_position_changed' and state == self._last_state:
+                continue
+            self._last_state = state
+            with self._clients_lock:
+                clients = self._clients[:]
+            for client in clients:
+                if not client.send(dict(event=event, state=state)):
+                    self.disconnect(client)
+
+    def execute(self, line):
+        """
+        Execute a single command on main loop thread & return reply.
+        """
+        try:
+            request = json.loads(line)
+            command = request['command']
+        except (ValueError, KeyError, TypeError):
+            return dict(reply=None, ok=False, error='malformed command')
+
+        try:
+            result = ui_dispatcher.run(self._execute, command, request)
+        except Exception as error:
+            return dict(reply=command, ok=False, error=str(error))
+        reply = dict(reply=command, ok=True)
+        if result is not None:
+            reply['result'] = result
+        return reply
+
+    def _execute(self, command, request):
+        """
+        Run *command* with arguments from *request*.
+        """
+        handler = self._commands.get(command)
+        if handler is None:
+            raise ValueError('unknown command')
+        return handler(request)
+
+    @staticmethod
+    def _seek(request):
+        """
+        Seek to absolute ``position`` or by relative ``delta``.
+        """
+        if 'position' in request:
+            player.seek_absolute(float(request['position']))
+        else:
+            player.seek(float(request['delta']))
+
+    @staticmethod
+    def _enqueue(request):
+        """
+        Append library track with ``track_id`` to queue.
+        """
+        track_id = request['track_id']
+        try:
+            track_id = UUID(track_id)
+        except ValueError:
+            pass
+        track = gp.get_track_by_id(track_id)
+        if track is None:
+            raise ValueError('track {} is not in library'.format(request['track_id']))
+        player.append_to_queue(track)
+
+
+ipc_server = _IPCServer()  # pylint: disable=invalid-name
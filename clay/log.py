@@ -2,28 +2,61 @@
 Logger implementation.
 """
 # pylint: disable=too-few-public-methods
-from threading import Lock
+# pylint: disable=broad-except
+from collections import deque
+from threading import Thread, Lock, Event, current_thread
 from datetime import datetime
+import gzip
+import json
+import os
+import shutil
+import time
 
 from clay.eventhook import EventHook
 
+LOG_FILE_PATH = '/tmp/clay.log'
+LEVELS = {
+    'DEBUG': 10,
+    'INFO': 20,
+    'WARNING': 30,
+    'ERROR': 40,
+}
+DEFAULT_LOG_LEVEL = 'DEBUG'
+DEFAULT_MAX_RECORDS = 1000
+DEFAULT_LOG_FORMAT = 'text'
+DEFAULT_MAX_FILE_SIZE = 10 * 1024 * 1024
+DEFAULT_MAX_FILE_AGE = 24 * 60 * 60
+DEFAULT_BACKUPS = 5
+WRITE_INTERVAL = 0.5
+START_TIME = time.time()
+
 
 class _LoggerRecord(object):
     """
     Represents a logger record.
+
+    Message is formatted right away, so that records never hold references
+    to (possibly mutable) arguments & can be read from any thread.
     """
+    __slots__ = ['_time', '_verbosity', '_message', '_thread_name']
+
     def __init__(self, verbosity, message, args):
-        self._timestamp = datetime.now()
+        self._time = time.time()
         self._verbosity = verbosity
+        if args:
+            try:
+                message = message % args
+            except (TypeError, ValueError):
+                message = '{} {}'.format(message, args)
         self._message = message
-        self._args = args
+        self._thread_name = current_thread().name
 
     @property
     def formatted_timestamp(self):
         """
         Return timestamp.
         """
-        return str(self._timestamp)
+        return str(datetime.fromtimestamp(self._time))
 
     @property
     def verbosity(self):
@@ -37,7 +70,114 @@ class _LoggerRecord(object):
         """
         Return formatted message.
         """
-        return self._message % self._args
+        return self._message
+
+    @property
+    def thread_name(self):
+        """
+        Return name of thread that has created this record.
+        """
+        return self._thread_name
+
+    @property
+    def elapsed(self):
+        """
+        Return number of seconds since app start.
+        """
+        return self._time - START_TIME
+
+    def to_text(self):
+        """
+        Return record as log file line.
+        """
+        return '{} {:8} {}\n'.format(
+            self.formatted_timestamp,
+            self.verbosity,
+            self.formatted_message
+        )
+
+    def to_json(self):
+        """
+        Return record as JSON log file line.
+        """
+        return json.dumps(dict(
+            timestamp=datetime.fromtimestamp(self._time).isoformat(),
+            level=self.verbosity,
+            thread=self.thread_name,
+            elapsed=round(self.elapsed, 6),
+            message=self.formatted_message
+        )) + '\n'
+
+
+class RotatingLogFile(object):
+    """
+    Log file that is rotated once it exceeds *max_size* bytes or *max_age* seconds
+    (zero disables the limit.)
+
+    Rotated files are compressed with gzip and kept as ``<path>.1.gz`` (newest)
+    to ``<path>.<backups>.gz`` (oldest). Log file left from previous run
+    is rotated when first written to.
+    """
+    def __init__(self, path, max_size, max_age, backups):
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.backups = backups
+        self._file = None
+        self._opened_at = None
+
+    def write(self, data):
+        """
+        Write *data*, rotate file if needed.
+        """
+        if self._file is None:
+            if os.path.exists(self.path) and os.path.getsize(self.path):
+                self.rotate()
+            self._open()
+        elif (self.max_size and self._file.tell() >= self.max_size) or \
+                (self.max_age and time.time() - self._opened_at >= self.max_age):
+            self._file.close()
+            self.rotate()
+            self._open()
+        self._file.write(data)
+        self._file.flush()
+
+    def _open(self):
+        """
+        Start new log file.
+        """
+        self._file = open(self.path, 'w')
+        self._opened_at = time.time()
+
+    def get_backup_path(self, number):
+        """
+        Return path of compressed rotated file.
+        """
+        return '{}.{}.gz'.format(self.path, number)
+
+    def rotate(self):
+        """
+        Compress current log file & shift older ones.
+        """
+        oldest = self.get_backup_path(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(self.get_backup_path(number)):
+                os.rename(self.get_backup_path(number), self.get_backup_path(number + 1))
+        if self.backups > 0:
+            with open(self.path, 'rb') as source, \
+                    gzip.open(self.get_backup_path(1), 'wb') as target:
+                shutil.copyfileobj(source, target)
+        os.remove(self.path)
+
+    def close(self):
+        """
+        Close log file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 
 class _Logger(object):
@@ -45,33 +185,102 @@ class _Logger(object):
     Global logger.
 
     Allows subscribing to log events.
+
+    Keeps a limited number of latest records in memory.
+    Records are written to log file in batches by a background thread.
     """
 
     def __init__(self):
-        self.logs = []
-        self.logfile = open('/tmp/clay.log', 'w')
+        self.logs = deque(maxlen=DEFAULT_MAX_RECORDS)
+        self.level = LEVELS[DEFAULT_LOG_LEVEL]
+        self.log_format = DEFAULT_LOG_FORMAT
+        self.logfile = RotatingLogFile(
+            LOG_FILE_PATH, DEFAULT_MAX_FILE_SIZE, DEFAULT_MAX_FILE_AGE, DEFAULT_BACKUPS
+        )
 
         self._lock = Lock()
+        self._write_lock = Lock()
+        self._pending = []
+        self._has_pending = Event()
+        self._thread = None
 
         self.on_log_event = EventHook()
 
+    def configure(self, level=None, max_records=None, log_format=None,
+                  max_file_size=None, max_file_age=None, backups=None):
+        """
+        Set minimal level of records to keep (e.g. "INFO"),
+        maximum number of records kept in memory,
+        log file format ("text" or "json") and rotation limits.
+        """
+        if level is not None:
+            self.level = LEVELS[level.upper()]
+        if max_records is not None:
+            with self._lock:
+                self.logs = deque(self.logs, maxlen=max_records)
+        if log_format is not None:
+            self.log_format = log_format
+        with self._write_lock:
+            if max_file_size is not None:
+                self.logfile.max_size = max_file_size
+            if max_file_age is not None:
+                self.logfile.max_age = max_file_age
+            if backups is not None:
+                self.logfile.backups = backups
+
+    @property
+    def max_records(self):
+        """
+        Return maximum number of records kept in memory.
+        """
+        return self.logs.maxlen
+
     def log(self, level, message, *args):
         """
         Add log item.
         """
-        self._lock.acquire()
-        try:
-            logger_record = _LoggerRecord(level, message, args)
+        if LEVELS.get(level, 0) < self.level:
+            return
+        logger_record = _LoggerRecord(level, message, args)
+        with self._lock:
             self.logs.append(logger_record)
-            self.logfile.write('{} {:8} {}\n'.format(
-                logger_record.formatted_timestamp,
-                logger_record.verbosity,
-                logger_record.formatted_message
-            ))
-            self.logfile.flush()
-            self.on_log_event.fire(logger_record)
-        finally:
-            self._lock.release()
+            self._pending.append(logger_record)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='clay-log-writer')
+                self._thread.daemon = True
+                self._thread.start()
+        self._has_pending.set()
+        self.on_log_event.fire(logger_record)
+
+    def _run(self):
+        """
+        Writer thread body.
+        """
+        while True:
+            self._has_pending.wait()
+            time.sleep(WRITE_INTERVAL)
+            self._has_pending.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending records to log file.
+        """
+        with self._lock:
+            records = self._pending
+            self._pending = []
+        if not records:
+            return
+        with self._write_lock:
+            try:
+                if self.log_format == 'json':
+                    lines = [logger_record.to_json() for logger_record in records]
+                else:
+                    lines = [logger_record.to_text() for logger_record in records]
+                self.logfile.write(''.join(lines))
+            except Exception:
+                # Nowhere to report this, records are still kept in memory.
+                pass
 
     def debug(self, message, *args):
         """
@@ -103,7 +312,8 @@ class _Logger(object):
         """
         Return all logs.
         """
-        return self.logs
+        with self._lock:
+            return list(self.logs)
 
 
 logger = _Logger()  # pylint: disable=invalid-name
@@ -0,0 +1,169 @@
+"""
+Google Play Music API call metrics.
+"""
+from threading import Lock, local
+import time
+
+from clay.statefile import StateFileWriter
+
+# Upper bounds (in seconds) of latency histogram buckets, last bucket is unbounded.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPORT_MAX_RATE = 1
+
+
+class _CallStats(object):
+    """
+    Counters of a single API call type.
+    """
+    __slots__ = ['count', 'errors', 'total_time', 'max_time', 'histogram', 'payload_bytes']
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.payload_bytes = 0
+
+    def add(self, duration, payload_bytes, failed):
+        """
+        Account a finished call.
+        """
+        self.count += 1
+        self.errors += int(failed)
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.payload_bytes += payload_bytes
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def get_percentile_bound(self, fraction):
+        """
+        Return upper bound of histogram bucket that contains *fraction* of calls
+        (``None`` if it is the unbounded one.)
+        """
+        threshold = self.count * fraction
+        seen = 0
+        for index, count in enumerate(self.histogram[:-1]):
+            seen += count
+            if seen >= threshold:
+                return LATENCY_BUCKETS[index]
+        return None
+
+    def to_dict(self):
+        """
+        Return counters as a dict.
+        """
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            total_time=round(self.total_time, 6),
+            mean_time=round(self.total_time / self.count, 6) if self.count else 0,
+            max_time=round(self.max_time, 6),
+            p50_bound=self.get_percentile_bound(0.5),
+            p95_bound=self.get_percentile_bound(0.95),
+            histogram=dict(zip(
+                [str(bound) for bound in LATENCY_BUCKETS] + ['inf'],
+                self.histogram
+            )),
+            payload_bytes=self.payload_bytes
+        )
+
+
+class _APIMetrics(object):
+    """
+    Collects call count, latency histogram, payload size & error count
+    for every API call type (protocol.)
+
+    Payload sizes are reported by HTTP layer (see :meth:`.add_payload`)
+    and are attributed to the call that is running on the same thread.
+
+    Singleton.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = {}
+        self._current = local()
+        self._writer = None
+
+    def set_export_path(self, path):
+        """
+        Keep writing metrics as JSON into file at *path* after every call.
+        """
+        self._writer = StateFileWriter(path, EXPORT_MAX_RATE) if path else None
+
+    def begin_call(self):
+        """
+        Start accounting payloads of a call made on current thread.
+        """
+        self._current.payload_bytes = 0
+
+    def add_payload(self, size):
+        """
+        Account *size* bytes received by a call made on current thread.
+        """
+        self._current.payload_bytes = getattr(self._current, 'payload_bytes', 0) + size
+
+    def end_call(self, name, duration, failed=False):
+        """
+        Account a finished call.
+        """
+        payload_bytes = getattr(self._current, 'payload_bytes', 0)
+        self._current.payload_bytes = 0
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _CallStats()
+            stats.add(duration, payload_bytes, failed)
+        if self._writer is not None:
+            self._writer.update(self.get_stats())
+
+    def wrap_call(self, func):
+        """
+        Return a function that wraps *func* (``Mobileclient._make_call``) and accounts its calls.
+        """
+        def _make_call(protocol, *args, **kwargs):
+            """
+            Wrapper function.
+            """
+            self.begin_call()
+            started = time.time()
+            try:
+                result = func(protocol, *args, **kwargs)
+            except Exception:
+                self.end_call(protocol.__name__, time.time() - started, failed=True)
+                raise
+            self.end_call(protocol.__name__, time.time() - started)
+            return result
+        return _make_call
+
+    def wrap_send(self, func):
+        """
+        Return a function that wraps session's *func* and accounts response sizes.
+        """
+        def send(*args, **kwargs):
+            """
+            Wrapper function.
+            """
+            response = func(*args, **kwargs)
+            self.add_payload(len(response.content))
+            return response
+        return send
+
+    def get_stats(self):
+        """
+        Return a dict of call names & their metrics.
+        """
+        with self._lock:
+            return {
+                name: stats.to_dict()
+                for name, stats
+                in self._stats.items()
+            }
+
+
+api_metrics = _APIMetrics()  # pylint: disable=invalid-name
@@ -0,0 +1,424 @@
+"""
+Background caching of playlists, stations & liked songs for offline playback.
+"""
+# pylint: disable=broad-except
+from collections import deque
+from threading import Lock
+import json
+import os
+
+from clay.cache import POOL_AUDIO
+from clay.downloader import downloader
+from clay.eventhook import EventHook
+from clay.gp import gp
+from clay.log import logger
+from clay.notifications import notification_area
+from clay.settings import settings, MEGABYTE
+from clay.workers import WorkerPool, PRIORITY_BACKGROUND
+
+OFFLINE_STATE_FILENAME = 'offline.json'
+LIKED_SONGS_KEY = 'liked-songs'
+DEFAULT_CONCURRENCY = 2
+DEFAULT_MIN_FREE_SPACE_MB = 500
+# Size estimate of not yet downloaded audio (320 kbps)
+ESTIMATED_BYTES_PER_SECOND = 40 * 1024
+
+
+class _OfflineTrack(object):
+    """
+    Track of an offline collection, contains just enough data to download it.
+    """
+    __slots__ = ['store_id', 'library_id', 'duration']
+
+    def __init__(self, store_id, library_id, duration):
+        self.store_id = store_id
+        self.library_id = library_id
+        self.duration = duration
+
+    @classmethod
+    def from_track(cls, track):
+        """
+        Construct from :class:`clay.gp.Track` instance.
+        """
+        return cls(
+            track.store_id,
+            str(track.library_id) if track.library_id else None,
+            track.duration
+        )
+
+    @property
+    def filename(self):
+        """
+        Return cache filename.
+        """
+        return self.store_id + '.mp3'
+
+    @property
+    def stream_id(self):
+        """
+        Return ID to request stream URL with.
+        """
+        if gp.is_subscribed:
+            return self.store_id
+        return self.library_id
+
+    @property
+    def estimated_size(self):
+        """
+        Return estimated audio size in bytes.
+        """
+        return self.duration // 1000 * ESTIMATED_BYTES_PER_SECOND
+
+    def to_list(self):
+        """
+        Return track as a list for state file.
+        """
+        return [self.store_id, self.library_id, self.duration]
+
+
+class _OfflineCollection(object):
+    """
+    Playlist, station or liked songs that is kept available offline.
+    """
+    def __init__(self, key, name, tracks):
+        self.key = key
+        self.name = name
+        self.tracks = tracks
+        self.done = 0
+        self.failed = 0
+
+    def to_dict(self):
+        """
+        Return collection as a dict for state file.
+        """
+        return dict(
+            name=self.name,
+            tracks=[track.to_list() for track in self.tracks]
+        )
+
+
+class _OfflineScheduler(object):
+    """
+    Downloads all tracks of playlists, stations & liked songs into cache in background,
+    at most *concurrency* tracks at a time.
+
+    Offline collections are saved into a state file in cache directory:
+    their tracks are protected from cache eviction and downloads of tracks
+    that are not in cache yet are resumed on next start.
+
+    Downloads stop once offline tracks would exceed audio cache budget
+    or free disk space would drop below *min_free_space* bytes.
+    Progress is reported in notification area.
+
+    Singleton.
+    """
+    def __init__(self, concurrency, min_free_space):
+        self.concurrency = concurrency
+        self.min_free_space = min_free_space
+        self.path = os.path.join(settings.get_cache_dir(), OFFLINE_STATE_FILENAME)
+
+        self._lock = Lock()
+        # Downloads run on threads of their own, so they never occupy shared worker pool
+        self._download_pool = WorkerPool(concurrency, 'clay-offline')
+        self._collections = {}
+        # (collection, track) waiting to be downloaded
+        self._queue = deque()
+        self._active = 0
+        # collections to report progress of
+        self._reported = []
+        self._is_ready = False
+        self._stop_reason = None
+        self._notification = None
+
+        # Fired with progress message whenever progress changes.
+        self.progress_changed = EventHook(collapse=True)
+        self.progress_changed.add_ui_handler(self._show_progress)
+
+        self._load()
+        gp.auth_state_changed += self._on_auth_state_changed
+
+    @staticmethod
+    def get_key(collection):
+        """
+        Return key of :class:`clay.gp.Playlist`, :class:`clay.gp.Station`
+        or :class:`clay.gp.LikedSongs` instance.
+        """
+        return collection.id or LIKED_SONGS_KEY
+
+    def _load(self):
+        """
+        Read offline collections from state file.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as state_file:
+                data = json.load(state_file)
+            for key, collection in data['collections'].items():
+                self._collections[key] = _OfflineCollection(
+                    key,
+                    collection['name'],
+                    [_OfflineTrack(*track) for track in collection['tracks']]
+                )
+        except Exception as error:
+            logger.error('Failed to read offline state: %s', repr(error))
+            self._collections = {}
+        self._update_pinned_files()
+
+    def _save(self):
+        """
+        Write offline collections into state file atomically.
+        """
+        with self._lock:
+            data = dict(collections={
+                key: collection.to_dict()
+                for key, collection
+                in self._collections.items()
+            })
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as state_file:
+                json.dump(data, state_file, separators=(',', ':'))
+            os.rename(temp_path, self.path)
+        except Exception as error:
+            logger.error('Failed to write offline state: %s', repr(error))
+
+    def _update_pinned_files(self):
+        """
+        Protect tracks of offline collections from cache eviction.
+        Downloads stopped for lack of space are retried since offline tracks have changed.
+        """
+        with self._lock:
+            filenames = set(
+                track.filename
+                for collection
+                in self._collections.values()
+                for track
+                in collection.tracks
+            )
+        settings.set_pinned_cache_files(filenames)
+        with self._lock:
+            self._stop_reason = None
+
+    def _on_auth_state_changed(self, is_auth):
+        """
+        Resume downloads of offline collections once user is logged in.
+        Downloads stopped for lack of space are retried on each login.
+        """
+        if not is_auth:
+            return
+        with self._lock:
+            self._stop_reason = None
+            was_ready = self._is_ready
+            self._is_ready = True
+            collections = list(self._collections.values())
+            if not was_ready:
+                self._queue.clear()
+        if not was_ready:
+            for collection in collections:
+                self._enqueue(collection)
+        self._fill()
+
+    def is_offline(self, collection):
+        """
+        Return ``True`` if *collection* is kept available offline.
+        """
+        return self.get_key(collection) in self._collections
+
+    def add(self, collection, tracks=None):
+        """
+        Make *collection* (playlist, station or liked songs) available offline:
+        download its *tracks* (all current tracks by default) into cache.
+        """
+        if tracks is None:
+            tracks = collection.tracks
+        key = self.get_key(collection)
+        offline_collection = _OfflineCollection(key, collection.name, [
+            _OfflineTrack.from_track(track)
+            for track
+            in tracks
+        ])
+        with self._lock:
+            self._drop(key)
+            self._collections[key] = offline_collection
+            self._reported.append(offline_collection)
+        self._save()
+        self._update_pinned_files()
+        self._enqueue(offline_collection)
+        self._fill()
+
+    def sync(self, collections):
+        """
+        Update offline *collections* whose tracks differ from the ones that are kept offline,
+        e.g. playlists that were made available offline while they were still loading.
+        """
+        for collection in collections:
+            with self._lock:
+                offline_collection = self._collections.get(self.get_key(collection))
+                if offline_collection is None:
+                    continue
+                offline_filenames = {track.filename for track in offline_collection.tracks}
+            if offline_filenames != {track.filename for track in collection.tracks}:
+                self.add(collection)
+
+    def remove(self, collection):
+        """
+        Stop keeping *collection* available offline.
+        Its tracks stay in cache until they are evicted.
+        """
+        with self._lock:
+            if not self._drop(self.get_key(collection)):
+                return
+        self._save()
+        self._update_pinned_files()
+        self._fill()
+
+    def _drop(self, key):
+        """
+        Forget offline collection with *key* & its queued tracks.
+        Return ``False`` if there was no such collection. Must be called with lock held.
+        """
+        offline_collection = self._collections.pop(key, None)
+        if offline_collection is None:
+            return False
+        self._queue = deque(
+            item
+            for item
+            in self._queue
+            if item[0] is not offline_collection
+        )
+        if offline_collection in self._reported:
+            self._reported.remove(offline_collection)
+        return True
+
+    def _enqueue(self, collection):
+        """
+        Queue tracks of *collection* that are not in cache yet
+        and report its progress if there are any.
+        """
+        with self._lock:
+            collection.done = 0
+            collection.failed = 0
+            for track in collection.tracks:
+                if settings.get_is_file_cached(track.filename):
+                    collection.done += 1
+                else:
+                    self._queue.append((collection, track))
+            if collection.done < len(collection.tracks) and collection not in self._reported:
+                self._reported.append(collection)
+        self._report()
+
+    def _get_stop_reason(self, track):
+        """
+        Return a reason why *track* must not be downloaded, ``None`` if there is enough space.
+        """
+        budget = settings.get_cache_budget(POOL_AUDIO)
+        if budget and settings.get_pinned_cache_size(POOL_AUDIO) + track.estimated_size > budget:
+            return 'audio cache budget ({} MB) is full'.format(budget // MEGABYTE)
+        try:
+            stat = os.statvfs(settings.get_cache_dir())
+        except (AttributeError, OSError):
+            return None
+        if stat.f_bavail * stat.f_frsize - track.estimated_size < self.min_free_space:
+            return 'less than {} MB of disk space left'.format(self.min_free_space // MEGABYTE)
+        return None
+
+    def _fill(self):
+        """
+        Start downloading queued tracks until concurrency limit is reached.
+        """
+        with self._lock:
+            while self._is_ready and self._queue and self._active < self.concurrency \
+                    and self._stop_reason is None:
+                collection, track = self._queue[0]
+                self._stop_reason = self._get_stop_reason(track)
+                if self._stop_reason is not None:
+                    logger.warning('Offline downloads stopped: %s', self._stop_reason)
+                    break
+                self._queue.popleft()
+                self._active += 1
+                self._download_pool.submit(PRIORITY_BACKGROUND, self._download, collection, track)
+        self._report()
+
+    def _download(self, collection, track):
+        """
+        Download single track into cache. Runs on a download thread.
+        """
+        try:
+            if not settings.get_is_file_cached(track.filename):
+                gp.save_stream_to_cache(gp.get_stream_url(track.stream_id), track.filename)
+        except Exception as error:
+            logger.error('Failed to download track %s for offline: %s', track.store_id, repr(error))
+            with self._lock:
+                collection.failed += 1
+        else:
+            with self._lock:
+                collection.done += 1
+        finally:
+            with self._lock:
+                self._active -= 1
+        self._fill()
+
+    def get_progress_message(self):
+        """
+        Return progress of offline collections that are being downloaded,
+        ``None`` if there is nothing to report.
+        """
+        with self._lock:
+            lines = [
+                u'{}: {}/{}{}'.format(
+                    collection.name,
+                    collection.done,
+                    len(collection.tracks),
+                    u', {} failed'.format(collection.failed) if collection.failed else u''
+                )
+                for collection
+                in self._reported
+            ]
+            is_active = bool(self._active)
+            is_finished = not self._active and not self._queue
+            stop_reason = self._stop_reason
+        if not lines:
+            return None
+        if is_active:
+            title = u'Making available offline ({} KiB/s):'.format(
+                downloader.get_stats()['rate'] // 1024
+            )
+        elif is_finished:
+            title = u'Available offline:'
+        elif stop_reason is not None:
+            title = u'Offline downloads stopped, {}:'.format(stop_reason)
+        else:
+            title = u'Waiting for offline downloads to start:'
+        return u'\n'.join([title] + lines)
+
+    def _report(self):
+        """
+        Publish current progress.
+        Once all downloads are finished, their summary is published one last time.
+        """
+        message = self.get_progress_message()
+        with self._lock:
+            if not self._active and not self._queue:
+                self._reported = []
+        self.progress_changed.fire(message)
+
+    def _show_progress(self, message):
+        """
+        Show *message* in notification area.
+        """
+        if message is None:
+            if self._notification is not None:
+                self._notification.close()
+                self._notification = None
+            return
+        if self._notification is None:
+            self._notification = notification_area.notify(message)
+        else:
+            self._notification.update(message)
+
+
+offline_scheduler = _OfflineScheduler(  # pylint: disable=invalid-name
+    settings.get('offline_downloads', 'clay_settings') or DEFAULT_CONCURRENCY,
+    (settings.get('offline_min_free_mb', 'clay_settings') or DEFAULT_MIN_FREE_SPACE_MB) * MEGABYTE
+)
@@ -8,6 +8,9 @@ from clay.log import logger
 from clay.clipboard import copy
 from clay.gp import gp
 from clay.hotkeys import hotkey_manager
+from clay.workers import worker_pool
+from clay.metrics import api_metrics
+from clay.downloader import downloader
 
 
 class DebugItem(urwid.AttrMap):
@@ -53,7 +56,7 @@ class DebugPage(urwid.Pile, AbstractPage):
         self.walker = urwid.SimpleListWalker([])
         for log_record in logger.get_logs():
             self._append_log(log_record)
-        logger.on_log_event += self._append_log
+        logger.on_log_event.add_ui_handler(self._append_log)
         self.listbox = urwid.ListBox(self.walker)
 
         self.debug_data = urwid.Text('')
@@ -66,7 +69,7 @@ class DebugPage(urwid.Pile, AbstractPage):
             self.listbox
         ])
 
-        gp.auth_state_changed += self.update
+        gp.auth_state_changed.add_ui_handler(self.update)
 
         self.update()
 
@@ -74,13 +77,51 @@ class DebugPage(urwid.Pile, AbstractPage):
         """
         Update this widget.
         """
-        self.debug_data.set_text(
+        stats = worker_pool.get_stats()
+        lines = [
             '- Is authenticated: {}\n'
-            '- Is subscribed: {}'.format(
+            '- Is subscribed: {}\n'
+            '- Workers: {} busy / {} started, {} queued {}'.format(
                 gp.is_authenticated,
-                gp.is_subscribed if gp.is_authenticated else None
+                gp.is_subscribed if gp.is_authenticated else None,
+                stats['busy'],
+                stats['threads'],
+                stats['queued'],
+                stats['queued_by_priority']
             )
+        ]
+        downloads = downloader.get_stats()
+        lines.append(
+            '- Downloads: {} active, {} requests, {} retries, {} failed, '
+            '{} KiB total, {} KiB/s'.format(
+                downloads['active'],
+                downloads['requests'],
+                downloads['retries'],
+                downloads['failures'],
+                downloads['bytes'] // 1024,
+                downloads['rate'] // 1024
+            )
+        )
+        calls = sorted(
+            api_metrics.get_stats().items(),
+            key=lambda item: item[1]['total_time'],
+            reverse=True
         )
+        for name, call in calls:
+            lines.append(
+                '- {}: {} calls, {} errors, {:.2f}s total, {:.3f}s avg, '
+                '{:.3f}s max, p95 {}, {} KiB'.format(
+                    name,
+                    call['count'],
+                    call['errors'],
+                    call['total_time'],
+                    call['mean_time'],
+                    call['max_time'],
+                    'n/a' if call['p95_bound'] is None else '<={}s'.format(call['p95_bound']),
+                    call['payload_bytes'] // 1024
+                )
+            )
+        self.debug_data.set_text('\n'.join(lines))
 
     def _append_log(self, log_record):
         """
@@ -88,6 +129,8 @@ class DebugPage(urwid.Pile, AbstractPage):
         """
         self.walker.insert(0, urwid.Divider(u'\u2500'))
         self.walker.insert(0, DebugItem(log_record))
+        # Two widgets per record, keep as many records as logger does.
+        del self.walker[logger.max_records * 2:]
 
     @property
     def name(self):
@@ -114,4 +157,4 @@ class DebugPage(urwid.Pile, AbstractPage):
         """
         Notify page that it is activated.
         """
-        pass
+        self.update()
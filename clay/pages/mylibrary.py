@@ -35,8 +35,9 @@ class MyLibraryPage(urwid.Columns, AbstractPage):
         self.songlist = SongListBox(app)
         self.notification = None
 
-        gp.auth_state_changed += self.get_all_songs
-        gp.caches_invalidated += self.get_all_songs
+        gp.auth_state_changed.add_ui_handler(self.get_all_songs)
+        gp.caches_invalidated.add_ui_handler(self.get_all_songs)
+        gp.library_synced.add_ui_handler(self.on_library_synced)
 
         super(MyLibraryPage, self).__init__([
             self.songlist
@@ -50,10 +51,17 @@ class MyLibraryPage(urwid.Columns, AbstractPage):
         if error:
             notification_area.notify('Failed to load my library: {}'.format(str(error)))
             return
-        tracks.sort(key=lambda k: k.original_data['title'])
+        tracks.sort(key=lambda k: k.title)
         self.songlist.populate(tracks)
         self.app.redraw()
 
+    def on_library_synced(self, tracks):
+        """
+        Called when library changes are fetched in background.
+        Re-populate song list.
+        """
+        self.on_get_all_songs(tracks[:], None)
+
     def get_all_songs(self, *_):
         """
         Called when auth state changes or GP caches are invalidated.
@@ -6,6 +6,7 @@ import urwid
 from clay.gp import gp
 from clay.songlist import SongListBox
 from clay.notifications import notification_area
+from clay.offline import offline_scheduler
 from clay.pages.page import AbstractPage
 from clay.hotkeys import hotkey_manager
 
@@ -18,10 +19,7 @@ class MyPlaylistListItem(urwid.Columns):
 
     def __init__(self, playlist):
         self.playlist = playlist
-        self.text = urwid.SelectableIcon(u' \u2630 {} ({})'.format(
-            self.playlist.name,
-            len(self.playlist.tracks)
-        ), cursor_position=3)
+        self.text = urwid.SelectableIcon(self._get_label(), cursor_position=3)
         self.text.set_layout('left', 'clip', None)
         self.content = urwid.AttrWrap(
             self.text,
@@ -30,6 +28,16 @@ class MyPlaylistListItem(urwid.Columns):
         )
         super(MyPlaylistListItem, self).__init__([self.content])
 
+    def _get_label(self):
+        """
+        Return playlist name with number of tracks & offline mark.
+        """
+        return u' \u2630 {} ({}){}'.format(
+            self.playlist.name,
+            len(self.playlist.tracks),
+            u' [offline]' if offline_scheduler.is_offline(self.playlist) else u''
+        )
+
     def keypress(self, size, key):
         """
         Handle keypress.
@@ -43,6 +51,19 @@ class MyPlaylistListItem(urwid.Columns):
         """
         urwid.emit_signal(self, 'activate', self)
 
+    def toggle_offline(self):
+        """
+        Make this playlist available offline or stop keeping it offline.
+        """
+        if offline_scheduler.is_offline(self.playlist):
+            offline_scheduler.remove(self.playlist)
+            notification_area.notify(
+                u'"{}" is no longer kept offline'.format(self.playlist.name)
+            )
+        else:
+            offline_scheduler.add(self.playlist)
+        self.text.set_text(self._get_label())
+
     def get_tracks(self):
         """
         Returns a list of :class:`clay.gp.Track` instances.
@@ -64,7 +85,8 @@ class MyPlaylistListBox(urwid.ListBox):
         ])
         self.notification = None
 
-        gp.auth_state_changed += self.auth_state_changed
+        gp.auth_state_changed.add_ui_handler(self.auth_state_changed)
+        gp.playlists_updated.add_ui_handler(self.on_playlists_updated)
 
         super(MyPlaylistListBox, self).__init__(self.walker)
 
@@ -83,11 +105,19 @@ class MyPlaylistListBox(urwid.ListBox):
     def on_get_playlists(self, playlists, error):
         """
         Called when a list of playlists fetch completes.
-        Populates list of playlists.
+        Playlists are populated by :meth:`.on_playlists_updated`.
+        Offline playlists are updated to their loaded tracks.
         """
         if error:
             notification_area.notify('Failed to get playlists: {}'.format(str(error)))
+            return
+        offline_scheduler.sync(playlists)
 
+    def on_playlists_updated(self, playlists, is_complete):
+        """
+        Called when more playlists are loaded.
+        Populates list of playlists, keeps loading indicator until all of them are loaded.
+        """
         items = []
         for playlist in playlists:
             myplaylistlistitem = MyPlaylistListItem(playlist)
@@ -96,6 +126,9 @@ class MyPlaylistListBox(urwid.ListBox):
             )
             items.append(myplaylistlistitem)
 
+        if not is_complete:
+            items.append(urwid.Text(u'\n \uf01e Loading playlists...', align='center'))
+
         self.walker[:] = items
 
         self.app.redraw()
@@ -3,9 +3,11 @@ Components for "My stations" page.
 """
 import urwid
 
+from clay.eventhook import EventHook
 from clay.gp import gp
 from clay.songlist import SongListBox
 from clay.notifications import notification_area
+from clay.offline import offline_scheduler
 from clay.pages.page import AbstractPage
 from clay.hotkeys import hotkey_manager
 
@@ -18,9 +20,7 @@ class MyStationListItem(urwid.Columns):
 
     def __init__(self, station):
         self.station = station
-        self.text = urwid.SelectableIcon(u' \u2708 {} '.format(
-            self.station.name
-        ), cursor_position=3)
+        self.text = urwid.SelectableIcon(self._get_label(), cursor_position=3)
         self.text.set_layout('left', 'clip', None)
         self.content = urwid.AttrWrap(
             self.text,
@@ -29,6 +29,19 @@ class MyStationListItem(urwid.Columns):
         )
         super(MyStationListItem, self).__init__([self.content])
 
+        # Fired on a worker thread when station tracks are loaded.
+        self.station_loaded = EventHook()
+        self.station_loaded.add_ui_handler(self._on_station_loaded)
+
+    def _get_label(self):
+        """
+        Return station name with offline mark.
+        """
+        return u' \u2708 {} {}'.format(
+            self.station.name,
+            u'[offline]' if offline_scheduler.is_offline(self.station) else u''
+        )
+
     def keypress(self, size, key):
         """
         Handle keypress.
@@ -42,6 +55,31 @@ class MyStationListItem(urwid.Columns):
         """
         urwid.emit_signal(self, 'activate', self)
 
+    def toggle_offline(self):
+        """
+        Make current tracks of this station available offline
+        or stop keeping them offline.
+        """
+        if offline_scheduler.is_offline(self.station):
+            offline_scheduler.remove(self.station)
+            notification_area.notify(
+                u'"{}" is no longer kept offline'.format(self.station.name)
+            )
+            self.text.set_text(self._get_label())
+        else:
+            self.station.load_tracks_async(callback=self.station_loaded.fire)
+
+    def _on_station_loaded(self, station, error):
+        """
+        Called on main loop thread when station tracks fetch completes.
+        Makes them available offline.
+        """
+        if error:
+            notification_area.notify('Failed to get station tracks: {}'.format(str(error)))
+            return
+        offline_scheduler.add(station, station.get_tracks())
+        self.text.set_text(self._get_label())
+
 
 class MyStationListBox(urwid.ListBox):
     """
@@ -57,7 +95,8 @@ class MyStationListBox(urwid.ListBox):
         ])
         self.notification = None
 
-        gp.auth_state_changed += self.auth_state_changed
+        gp.auth_state_changed.add_ui_handler(self.auth_state_changed)
+        gp.stations_updated.add_ui_handler(self.on_stations_updated)
 
         super(MyStationListBox, self).__init__(self.walker)
 
@@ -73,14 +112,19 @@ class MyStationListBox(urwid.ListBox):
 
             gp.get_all_user_station_contents_async(callback=self.on_get_stations)
 
-    def on_get_stations(self, stations, error):
+    def on_get_stations(self, _, error):
         """
         Called when a list of stations fetch completes.
-        Populates list of stations.
+        Stations are populated by :meth:`.on_stations_updated`.
         """
         if error:
             notification_area.notify('Failed to get stations: {}'.format(str(error)))
 
+    def on_stations_updated(self, stations, is_complete):
+        """
+        Called when more stations are loaded.
+        Populates list of stations, keeps loading indicator until all of them are loaded.
+        """
         items = []
         for station in stations:
             mystationlistitem = MyStationListItem(station)
@@ -89,6 +133,9 @@ class MyStationListBox(urwid.ListBox):
             )
             items.append(mystationlistitem)
 
+        if not is_complete:
+            items.append(urwid.Text(u'\n \uf01e Loading stations...', align='center'))
+
         self.walker[:] = items
 
         self.app.redraw()
@@ -32,9 +32,9 @@ class QueuePage(urwid.Columns, AbstractPage):
         self.songlist = SongListBox(app)
 
         self.songlist.populate(player.get_queue_tracks())
-        player.queue_changed += self.queue_changed
-        player.track_appended += self.track_appended
-        player.track_removed += self.track_removed
+        player.queue_changed.add_ui_handler(self.queue_changed)
+        player.track_appended.add_ui_handler(self.track_appended)
+        player.track_removed.add_ui_handler(self.track_removed)
 
         super(QueuePage, self).__init__([
             self.songlist
@@ -69,6 +69,8 @@ class SearchPage(urwid.Pile, AbstractPage):
     def __init__(self, app):
         self.app = app
         self.songlist = SongListBox(app)
+        self.query = None
+        self.local_results = []
 
         self.search_box = SearchBox()
 
@@ -83,21 +85,54 @@ class SearchPage(urwid.Pile, AbstractPage):
     def perform_search(self, query):
         """
         Search tracks by query.
-        """
-        self.songlist.set_placeholder(u' \U0001F50D Searching for "{}"...'.format(
-            query
-        ))
-        gp.search_async(query, callback=self.search_finished)
 
-    def search_finished(self, results, error):
+        Matching tracks from "My library" are displayed right away,
+        remote results are appended once they arrive.
+        """
+        self.query = query
+        self.local_results = gp.search_library(query)
+        if self.local_results:
+            self.songlist.populate(self.local_results)
+        else:
+            self.songlist.set_placeholder(u' \U0001F50D Searching for "{}"...'.format(
+                query
+            ))
+        gp.search_async(
+            query,
+            callback=lambda results, error: self.search_finished(query, results, error)
+        )
+
+    def search_finished(self, query, results, error):
         """
-        Populate song list with search results.
+        Merge remote search results into song list.
+        Results of outdated queries are ignored.
         """
+        if query != self.query:
+            return
         if error:
             notification_area.notify('Failed to search: {}'.format(str(error)))
+            if not self.local_results:
+                self.songlist.populate([])
         else:
-            self.songlist.populate(results.get_tracks())
-            self.app.redraw()
+            store_ids = set(
+                track.store_id
+                for track
+                in self.local_results
+                if track.store_id
+            )
+            remote_tracks = [
+                track
+                for track
+                in results.get_tracks()
+                if track.store_id not in store_ids
+            ]
+            if self.local_results:
+                # Keep focus where user has moved it while waiting.
+                for track in remote_tracks:
+                    self.songlist.append_track(track)
+            else:
+                self.songlist.populate(remote_tracks)
+        self.app.redraw()
 
     def activate(self):
         pass
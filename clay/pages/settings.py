@@ -153,7 +153,7 @@ class SettingsPage(urwid.Columns, AbstractPage):
             edit_text=settings.get('device_id', 'play_settings') or ''
         )
         self.download_tracks = urwid.CheckBox(
-            'Download tracks before playback',
+            'Save tracks to cache during playback',
             state=settings.get('download_tracks', 'play_settings') or False
         )
         self.equalizer = Equalizer()
@@ -0,0 +1,151 @@
+"""
+Paged fetching of Google Play Music listings & assembly of playlists from their entries.
+"""
+from operator import itemgetter
+from threading import Lock
+
+from clay.workers import worker_pool, PRIORITY_INTERACTIVE
+
+LIST_PAGE_LEN = 1000
+
+
+def iter_pages(make_call, protocol, updated_after=None, include_deleted=False,
+               page_len=LIST_PAGE_LEN):
+    """
+    Fetch listing *protocol* (e.g. ``ListTracks``) page by page with *make_call*
+    (``Mobileclient._make_call``) and yield a list of items of each page.
+
+    Deleted items are skipped unless *include_deleted* is ``True``.
+    """
+    next_page_token = None
+    while True:
+        response = make_call(
+            protocol,
+            updated_after=updated_after,
+            start_token=next_page_token,
+            max_results=page_len
+        )
+        items = response.get('data', {}).get('items', [])
+        if not include_deleted:
+            items = [item for item in items if not item.get('deleted', False)]
+        yield items
+        prev_page_token = next_page_token
+        next_page_token = response.get('nextPageToken')
+        if not next_page_token or next_page_token == prev_page_token:
+            return
+
+
+class PlaylistBuilder(object):
+    """
+    Collects playlist entries that are parsed page by page
+    (possibly on different threads) into playlists.
+
+    *parse_entry* is called with playlist entry data and returns a track or ``None``.
+    *on_update* is called with a list of all playlists after every parsed page.
+    """
+    def __init__(self, parse_entry, on_update=None):
+        self._parse_entry = parse_entry
+        self._on_update = on_update
+        self._lock = Lock()
+        self._tasks = []
+        self.playlists = []
+        # playlist ID -> list of (absolute position, track), ``None`` until started
+        self._entries = None
+
+    @property
+    def is_started(self):
+        """
+        Return ``True`` if playlists are known and entries can be added.
+        """
+        return self._entries is not None
+
+    def start(self, playlists):
+        """
+        Start collecting entries of *playlists* (models with ``id`` & ``tracks`` attributes.)
+        """
+        with self._lock:
+            self.playlists = playlists
+            self._entries = {playlist.id: [] for playlist in playlists}
+
+    def add_entries(self, entries):
+        """
+        Parse a page of playlist entries and add tracks to their playlists.
+        Return a list of all playlists.
+        """
+        parsed = []
+        for entry in entries:
+            track = self._parse_entry(entry)
+            if track is not None:
+                parsed.append((entry['playlistId'], entry.get('absolutePosition', ''), track))
+
+        with self._lock:
+            changed_ids = set()
+            for playlist_id, position, track in parsed:
+                # Entries of shared playlists are skipped.
+                if playlist_id in self._entries:
+                    self._entries[playlist_id].append((position, track))
+                    changed_ids.add(playlist_id)
+            for playlist in self.playlists:
+                if playlist.id in changed_ids:
+                    playlist_entries = self._entries[playlist.id]
+                    playlist_entries.sort(key=itemgetter(0))
+                    playlist.tracks = [track for _, track in playlist_entries]
+            return list(self.playlists)
+
+    def load(self, pages, library_task, playlists_task):
+        """
+        Parse entry *pages* (iterable of lists of entries) on worker threads as they arrive
+        and return once all of them are parsed.
+
+        Entries reference library tracks, so parsing starts once *library_task* is done
+        and *playlists_task* has returned playlists to collect entries of.
+        """
+        pending = []
+        for entries in pages:
+            pending.append(entries)
+            if not self.is_started and library_task.done and playlists_task.done:
+                self._start_after(library_task, playlists_task)
+            if self.is_started:
+                self._submit(pending)
+                pending = []
+
+        if not self.is_started:
+            self._start_after(library_task, playlists_task)
+        self._submit(pending)
+        self.wait()
+
+    def wait(self, ignore_errors=False):
+        """
+        Wait until all scheduled pages are parsed.
+        """
+        for task in self._tasks:
+            try:
+                task.wait()
+            except Exception:  # pylint: disable=broad-except
+                if not ignore_errors:
+                    raise
+
+    def _start_after(self, library_task, playlists_task):
+        """
+        Wait for library & playlists and start collecting entries.
+        """
+        library_task.wait()
+        self.start(playlists_task.wait())
+
+    def _submit(self, pages):
+        """
+        Schedule parsing of *pages*.
+        """
+        self._tasks.extend(
+            worker_pool.submit_task(PRIORITY_INTERACTIVE, self._add_page, entries)
+            for entries
+            in pages
+        )
+
+    def _add_page(self, entries):
+        """
+        Parse a page of entries and report updated playlists.
+        """
+        playlists = self.add_entries(entries)
+        if self._on_update is not None:
+            self._on_update(playlists)
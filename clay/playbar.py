@@ -103,10 +103,10 @@ class PlayBar(urwid.Pile):
         ])
         self.update()
 
-        player.media_position_changed += self.update
-        player.media_state_changed += self.update
-        player.track_changed += self.update
-        player.playback_flags_changed += self.update
+        player.media_position_changed.add_ui_handler(self.update)
+        player.media_state_changed.add_ui_handler(self.update)
+        player.track_changed.add_ui_handler(self.update)
+        player.playback_flags_changed.add_ui_handler(self.update)
 
     def get_rotating_bar(self):
         """
@@ -3,22 +3,27 @@ Media player built using libVLC.
 """
 # pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-public-methods
+# pylint: disable=broad-except
 from random import randint
 from ctypes import CFUNCTYPE, c_void_p, c_int, c_char_p
-import json
+from threading import Lock
 import os
 
-try:  # Python 3.x
-    from urllib.request import urlopen
-except ImportError:  # Python 2.x
-    from urllib2 import urlopen
-
 from clay import vlc, meta
 from clay.eventhook import EventHook
+from clay.gp import gp
 from clay.notifications import notification_area
 from clay.osd import osd_manager
 from clay.settings import settings
 from clay.log import logger
+from clay.statefile import StateFileWriter
+from clay.tee import tee_server
+from clay.workers import worker_pool, WorkerPool, PRIORITY_PLAYBACK, PRIORITY_BACKGROUND
+
+STATE_FILE_PATH = '/tmp/clay.json'
+DEFAULT_STATE_FILE_MAX_RATE = 2
+# Number of tracks that are saved into cache at a time (except tracks played from local server)
+DOWNLOAD_THREADS = 2
 
 
 class _Queue(object):
@@ -31,6 +36,9 @@ class _Queue(object):
     Queue handles shuffling & repeating.
 
     Can be populated with :class:`clay.gp.Track` instances.
+
+    Random picks are shared by UI & worker threads (see :meth:`.get_upcoming_tracks`),
+    so they are guarded with a lock.
     """
     def __init__(self):
         self.random = False
@@ -38,6 +46,8 @@ class _Queue(object):
 
         self.tracks = []
         self._played_tracks = []
+        self._random_indexes = []
+        self._lock = Lock()
         self.current_track_index = None
 
     def load(self, tracks, current_track_index=None):
@@ -46,7 +56,9 @@ class _Queue(object):
 
         *current_track_index* can be either ``None`` or ``int`` (zero-indexed).
         """
-        self.tracks = tracks[:]
+        with self._lock:
+            self.tracks = tracks[:]
+            self._random_indexes = []
         if (current_track_index is None) and self.tracks:
             current_track_index = 0
         self.current_track_index = current_track_index
@@ -55,17 +67,21 @@ class _Queue(object):
         """
         Append track to playlist.
         """
-        self.tracks.append(track)
+        with self._lock:
+            self.tracks.append(track)
+            self._random_indexes = []
 
     def remove(self, track):
         """
         Remove track from playlist if is present there.
         """
-        if track not in self.tracks:
-            return
+        with self._lock:
+            if track not in self.tracks:
+                return
 
-        index = self.tracks.index(track)
-        self.tracks.remove(track)
+            index = self.tracks.index(track)
+            self.tracks.remove(track)
+            self._random_indexes = []
         if self.current_track_index is None:
             return
         if index < self.current_track_index:
@@ -101,15 +117,54 @@ class _Queue(object):
             return self.get_current_track()
 
         if self.random:
-            self.current_track_index = randint(0, len(self.tracks) - 1)
+            with self._lock:
+                if not self._random_indexes:
+                    self._random_indexes.append(randint(0, len(self.tracks) - 1))
+                self.current_track_index = self._random_indexes.pop(0)
             return self.get_current_track()
 
-        self.current_track_index += 1
-        if (self.current_track_index + 1) >= len(self.tracks):
-            self.current_track_index = 0
+        self.current_track_index = self._get_next_index(self.current_track_index)
 
         return self.get_current_track()
 
+    def _get_next_index(self, index):
+        """
+        Return index of track that follows track with *index* in non-random mode.
+        """
+        index += 1
+        if (index + 1) >= len(self.tracks):
+            index = 0
+        return index
+
+    def get_upcoming_tracks(self, count):
+        """
+        Return up to *count* tracks that will most likely be played next.
+
+        Random picks are made in advance, so that :meth:`.next` will yield
+        the same tracks. If track repetition is enabled, current track comes first.
+        """
+        with self._lock:
+            if self.current_track_index is None or not self.tracks or count <= 0:
+                return []
+
+            tracks = []
+            if self.repeat_one:
+                tracks.append(self.get_current_track())
+
+            if self.random:
+                while len(self._random_indexes) < count:
+                    self._random_indexes.append(randint(0, len(self.tracks) - 1))
+                indexes = self._random_indexes[:count]
+            else:
+                indexes = []
+                index = self.current_track_index
+                for _ in range(min(count, len(self.tracks))):
+                    index = self._get_next_index(index)
+                    indexes.append(index)
+
+            tracks.extend(self.tracks[i] for i in indexes)
+        return tracks[:count]
+
     def prev(self, force=False):
         """
         Revert to their last song and return it.
@@ -135,6 +190,60 @@ class _Queue(object):
         """
         return self.tracks
 
+
+class _Prefetcher(object):
+    """
+    Resolves stream URLs for upcoming queue tracks in background
+    and optionally saves their audio into cache.
+
+    Pending work is dropped whenever queue, current track or playback flags change.
+    Audio is downloaded on *download_pool*, so that worker pool is only busy with URL requests.
+    """
+    def __init__(self, queue, save_track_to_cache, download_pool):
+        self.queue = queue
+        self._save_track_to_cache = save_track_to_cache
+        self._download_pool = download_pool
+        self._generation = 0
+        self._lock = Lock()
+
+    def reset(self, *_):
+        """
+        Drop pending work and start prefetching tracks that are going to be played next.
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+
+        count = settings.get('prefetch_tracks', 'play_settings') or 0
+        for track in self.queue.get_upcoming_tracks(count):
+            if settings.get_is_file_cached(track.filename):
+                continue
+            track.get_url(
+                callback=lambda url, error, track: self._on_get_url(url, error, track, generation),
+                prefetch=True
+            )
+
+    def _on_get_url(self, url, error, track, generation):
+        """
+        Called when stream URL of upcoming track is resolved.
+        Saves track audio into cache if enabled.
+        """
+        if error:
+            logger.debug('Failed to prefetch URL for track %s: %s', track, str(error))
+            return
+        if generation != self._generation:
+            return
+        if settings.get('prefetch_audio', 'play_settings'):
+            self._download_pool.submit(PRIORITY_BACKGROUND, self._download, url, track, generation)
+
+    def _download(self, url, track, generation):
+        """
+        Save track audio into cache unless prefetched tracks have changed since it was queued.
+        """
+        if generation == self._generation:
+            self._save_track_to_cache(url, track)
+
+
 #+pylint: disable=unused-argument
 def _dummy_log(data, level, ctx, fmt, args):
     """
@@ -152,11 +261,11 @@ class _Player(object):
 
     Singleton.
     """
-    media_position_changed = EventHook()
-    media_state_changed = EventHook()
+    media_position_changed = EventHook(collapse=True)
+    media_state_changed = EventHook(collapse=True)
     track_changed = EventHook()
-    playback_flags_changed = EventHook()
-    queue_changed = EventHook()
+    playback_flags_changed = EventHook(collapse=True)
+    queue_changed = EventHook(collapse=True)
     track_appended = EventHook()
     track_removed = EventHook()
 
@@ -199,8 +308,20 @@ class _Player(object):
         self.media_player.set_equalizer(self.equalizer)
         self._create_station_notification = None
         self._is_loading = False
+        self._state_writer = StateFileWriter(
+            STATE_FILE_PATH,
+            settings.get('state_file_max_rate', 'clay_settings') or DEFAULT_STATE_FILE_MAX_RATE
+        )
         self.queue = _Queue()
 
+        self._download_pool = WorkerPool(DOWNLOAD_THREADS, 'clay-download')
+        self.prefetcher = _Prefetcher(self.queue, self._save_track_to_cache, self._download_pool)
+        self.track_changed += self.prefetcher.reset
+        self.queue_changed += self.prefetcher.reset
+        self.playback_flags_changed += self.prefetcher.reset
+        self.track_appended += self.prefetcher.reset
+        self.track_removed += self.prefetcher.reset
+
     def enable_xorg_bindings(self):
         """Enable the global X bindings using keybinder"""
         if os.environ.get("DISPLAY") is None:
@@ -212,32 +333,36 @@ class _Player(object):
         hotkey_manager.next += self.next
         hotkey_manager.prev += lambda: self.seek_absolute(0)
 
-    def broadcast_state(self):
+    def get_state(self):
         """
-        Write current playback state into a ``/tmp/clay.json`` file.
+        Return current playback state as a ``dict``.
         """
         track = self.queue.get_current_track()
         if track is None:
-            data = dict(
+            return dict(
                 playing=False,
                 artist=None,
                 title=None,
                 progress=None,
                 length=None
             )
-        else:
-            data = dict(
-                loading=self.is_loading,
-                playing=self.is_playing,
-                artist=track.artist,
-                title=track.title,
-                progress=self.get_play_progress_seconds(),
-                length=self.get_length_seconds(),
-                album_name=track.album_name,
-                album_url=track.album_url
-            )
-        with open('/tmp/clay.json', 'w') as statefile:
-            statefile.write(json.dumps(data, indent=4))
+        return dict(
+            loading=self.is_loading,
+            playing=self.is_playing,
+            artist=track.artist,
+            title=track.title,
+            progress=self.get_play_progress_seconds(),
+            length=self.get_length_seconds(),
+            album_name=track.album_name,
+            album_url=track.album_url
+        )
+
+    def broadcast_state(self):
+        """
+        Schedule current playback state to be written into a ``/tmp/clay.json`` file.
+        See :class:`clay.statefile.StateFileWriter`.
+        """
+        self._state_writer.update(self.get_state())
 
     def _media_state_changed(self, event):
         """
@@ -252,10 +377,13 @@ class _Player(object):
         """
         Called when end of currently played track is reached.
         Increments the play count and advances to the next track.
+
+        libVLC must not be called from its own event callbacks,
+        so the next track is started on a worker thread.
         """
         assert event
         self.queue.get_current_track().increment_playcount()
-        self.next()
+        worker_pool.submit(PRIORITY_PLAYBACK, self.next)
 
     def _media_position_changed(self, event):
         """
@@ -377,7 +505,7 @@ class _Player(object):
             path = settings.get_cached_file_path(track.filename)
 
             if path is None:
-                logger.debug('Track %s not in cache, downloading...', track.store_id)
+                logger.debug('Track %s not in cache, streaming & downloading...', track.store_id)
                 track.get_url(callback=self._download_track)
             else:
                 logger.debug('Track %s in cache, playing', track.store_id)
@@ -387,17 +515,37 @@ class _Player(object):
             track.get_url(callback=self._play_ready)
 
     def _download_track(self, url, error, track):
+        """
+        Called once track's media stream URL request completes.
+        Starts saving *url* into cache and plays the file while it is being downloaded
+        (see :class:`clay.tee._TeeServer`.)
+        """
         if error:
-            notification_area.notify('Failed to request media URL: {}'.format(str(error)))
-            logger.error(
-                'Failed to request media URL for track %s: %s',
-                track.original_data,
-                str(error)
-            )
+            self._play_ready(url, error, track)
+            return
+        tee_url = tee_server.start(url, track.filename)
+        if tee_url is not None:
+            self._play_ready(tee_url, None, track)
             return
-        response = urlopen(url)
-        path = settings.save_file_to_cache(track.filename, response.read())
-        self._play_ready(path, None, track)
+        # Local server is unavailable, stream & download separately
+        self._play_ready(url, None, track)
+        self._download_pool.submit(PRIORITY_PLAYBACK, self._save_track_to_cache, url, track)
+
+    def _save_track_to_cache(self, url, track):
+        """
+        Download track from *url* into cache (see :meth:`clay.gp._GP.save_stream_to_cache`.)
+
+        Partially downloaded files are resumed using HTTP Range requests
+        and concurrent downloads of the same track share one request.
+        Return path to cached file or ``None`` if download failed.
+        """
+        try:
+            path = gp.save_stream_to_cache(url, track.filename)
+            logger.debug('Track %s saved to cache', track.store_id)
+            return path
+        except Exception as error:
+            logger.error('Failed to download track %s: %s', track, repr(error))
+        return None
 
     def _play_ready(self, url, error, track):
         """
@@ -409,7 +557,7 @@ class _Player(object):
             notification_area.notify('Failed to request media URL: {}'.format(str(error)))
             logger.error(
                 'Failed to request media URL for track %s: %s',
-                track.original_data,
+                track,
                 str(error)
             )
             return
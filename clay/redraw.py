@@ -0,0 +1,65 @@
+"""
+Coalesced screen redraws.
+"""
+from threading import Thread, Event
+import os
+import time
+
+
+class RedrawScheduler(object):
+    """
+    Schedules screen redraws on urwid main loop thread.
+
+    Redraw requests may come from any thread and are coalesced:
+    main loop is woken up through a pipe at most *max_fps* times per second.
+    Urwid repaints the screen when main loop becomes idle after handling
+    the wakeup, so all requests made during a frame result in a single repaint.
+    """
+    def __init__(self, loop, max_fps):
+        self.min_interval = 1.0 / max_fps
+        self._loop = loop
+        self._pipe = loop.watch_pipe(self._on_wakeup)
+        self._is_requested = Event()
+        self._is_stopped = False
+        self._thread = Thread(target=self._run, name='clay-redraw')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def request(self):
+        """
+        Mark screen as dirty. Safe to call from any thread.
+        """
+        self._is_requested.set()
+
+    def stop(self):
+        """
+        Stop scheduling redraws & close wakeup pipe.
+        Must be called on main loop thread.
+        """
+        self._is_stopped = True
+        self._is_requested.set()
+        self._loop.remove_watch_pipe(self._pipe)
+        os.close(self._pipe)
+
+    def _run(self):
+        """
+        Scheduler thread body.
+        """
+        while True:
+            self._is_requested.wait()
+            self._is_requested.clear()
+            if self._is_stopped:
+                break
+            try:
+                os.write(self._pipe, b'.')
+            except OSError:
+                break
+            time.sleep(self.min_interval)
+
+    @staticmethod
+    def _on_wakeup(_):
+        """
+        Called on main loop thread. Screen is redrawn once this returns.
+        Return ``True`` to keep the pipe open.
+        """
+        return True
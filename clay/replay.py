@@ -0,0 +1,166 @@
+"""
+Recording & replaying of Google Play Music API calls.
+
+Recorded calls are stored as JSON lines, one call per line::
+
+    {"protocol": "ListTracks", "args": [...], "kwargs": {...},
+     "result": ..., "error": null, "duration": 0.42}
+
+Replay serves recorded results instead of making network requests,
+so library loading, playlist parsing, search etc. can be profiled offline.
+"""
+# pylint: disable=broad-except
+from threading import Lock
+import json
+import os
+import time
+
+from gmusicapi.exceptions import CallFailure
+
+from clay.log import logger
+
+LATENCY_RECORDED = 'recorded'
+
+
+class ApiRecorder(object):
+    """
+    Appends every call made through :meth:`.wrap` to a file at *path*.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = Lock()
+
+    def wrap(self, func):
+        """
+        Return a function that calls *func* (``Mobileclient._make_call``) and records the call.
+        """
+        def _make_call(protocol, *args, **kwargs):
+            """
+            Wrapper function.
+            """
+            started = time.time()
+            try:
+                result = func(protocol, *args, **kwargs)
+            except Exception as error:
+                self.record(protocol.__name__, args, kwargs, None, error, time.time() - started)
+                raise
+            self.record(protocol.__name__, args, kwargs, result, None, time.time() - started)
+            return result
+        return _make_call
+
+    def record(self, protocol_name, args, kwargs, result, error, duration):
+        """
+        Append a single call to file.
+        """
+        line = json.dumps(dict(
+            protocol=protocol_name,
+            args=args,
+            kwargs=kwargs,
+            result=result,
+            error=None if error is None else str(error),
+            duration=round(duration, 6)
+        ), default=str)
+        with self._lock:
+            with open(self.path, 'a') as record_file:
+                record_file.write(line + '\n')
+
+
+class ApiReplayer(object):
+    """
+    Serves calls recorded by :class:`.ApiRecorder` from a file at *path*.
+
+    Each call is answered with a recorded call of the same protocol that has the most
+    matching arguments (so calls that differ e.g. only by timestamps are still served.)
+    Calls that were not served yet are preferred, so repeated calls
+    get recorded responses in original order.
+
+    Every call is delayed by *latency* seconds or, if it is :attr:`.LATENCY_RECORDED`,
+    by its recorded duration.
+    """
+    def __init__(self, path, latency=0):
+        self.latency = latency
+        self._lock = Lock()
+        # protocol name -> list of [call, times served]
+        self._calls = {}
+        with open(path, 'r') as record_file:
+            for line in record_file:
+                if line.strip():
+                    call = json.loads(line)
+                    self._calls.setdefault(call['protocol'], []).append([call, 0])
+
+    @staticmethod
+    def _normalize(value):
+        """
+        Convert *value* to what it looks like after being recorded.
+        """
+        return json.loads(json.dumps(value, default=str))
+
+    @staticmethod
+    def _get_similarity(call, args, kwargs):
+        """
+        Return number of arguments that match between recorded *call* and a new one.
+        """
+        similarity = sum(
+            1
+            for recorded, arg
+            in zip(call['args'], args)
+            if recorded == arg
+        )
+        similarity += sum(
+            1
+            for key, value
+            in kwargs.items()
+            if key in call['kwargs'] and call['kwargs'][key] == value
+        )
+        return similarity
+
+    def make_call(self, protocol, *args, **kwargs):
+        """
+        Replacement for ``Mobileclient._make_call``.
+        """
+        name = protocol.__name__
+        args = self._normalize(args)
+        kwargs = self._normalize(kwargs)
+        with self._lock:
+            entries = self._calls.get(name)
+            if not entries:
+                raise CallFailure('no recorded responses', name)
+            entry = max(
+                entries,
+                key=lambda entry: (
+                    self._get_similarity(entry[0], args, kwargs),
+                    -entry[1]
+                )
+            )
+            entry[1] += 1
+            call = entry[0]
+
+        time.sleep(call['duration'] if self.latency == LATENCY_RECORDED else self.latency)
+
+        if call['error'] is not None:
+            raise CallFailure(call['error'], name)
+        return call['result']
+
+
+def get_api_backend(func):
+    """
+    Return function that performs API calls: *func* itself (``Mobileclient._make_call``),
+    a replay of calls recorded earlier (``CLAY_API_REPLAY=<file>``)
+    and/or a wrapper that records calls (``CLAY_API_RECORD=<file>``.)
+
+    Replayed calls are delayed by ``CLAY_API_REPLAY_LATENCY`` milliseconds
+    or by their recorded durations if it is set to "recorded".
+    """
+    replay_path = os.getenv('CLAY_API_REPLAY')
+    if replay_path:
+        latency = os.getenv('CLAY_API_REPLAY_LATENCY', '0')
+        func = ApiReplayer(
+            replay_path,
+            latency if latency == LATENCY_RECORDED else float(latency) / 1000
+        ).make_call
+        logger.info('Replaying API calls from %s', replay_path)
+    record_path = os.getenv('CLAY_API_RECORD')
+    if record_path:
+        func = ApiRecorder(record_path).wrap(func)
+        logger.info('Recording API calls to %s', record_path)
+    return func
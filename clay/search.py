@@ -0,0 +1,150 @@
+"""
+Local full-text search over library tracks.
+"""
+from bisect import bisect_right
+import re
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchIndex(object):
+    """
+    Inverted index over title, artist & album tokens of tracks.
+
+    Every query token is matched against indexed tokens exactly,
+    by prefix and by trigram similarity (to tolerate typos.)
+    Tracks must match all query tokens and are ranked by match quality
+    weighted by field (title matches are the most important.)
+    """
+    FIELD_WEIGHTS = (
+        ('title', 3),
+        ('artist', 2),
+        ('album_name', 1),
+    )
+    MATCH_EXACT = 1.0
+    MATCH_PREFIX = 0.75
+    MATCH_FUZZY = 0.5
+    MIN_SIMILARITY = 0.4
+    MIN_FUZZY_TOKEN_LEN = 3
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+        # token -> {track index: field weight}
+        self._postings = {}
+        # trigram -> set of tokens
+        self._trigrams = {}
+        self._sorted_tokens = []
+
+        for index, track in enumerate(tracks):
+            for field, weight in SearchIndex.FIELD_WEIGHTS:
+                for token in self.tokenize(getattr(track, field)):
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = {}
+                    if postings.get(index, 0) < weight:
+                        postings[index] = weight
+
+        for token in self._postings:
+            if len(token) < SearchIndex.MIN_FUZZY_TOKEN_LEN or token.isdigit():
+                continue
+            for trigram in self.get_trigrams(token):
+                self._trigrams.setdefault(trigram, set()).add(token)
+        self._sorted_tokens = sorted(self._postings)
+
+    @staticmethod
+    def tokenize(text):
+        """
+        Split *text* into lowercase word tokens.
+        """
+        if not text:
+            return []
+        return TOKEN_RE.findall(text.lower())
+
+    @staticmethod
+    def get_trigrams(token):
+        """
+        Return set of trigrams of *token* (padded, so short tokens have some too.)
+        """
+        padded = u' {} '.format(token)
+        return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    def _get_prefixed_tokens(self, prefix):
+        """
+        Return indexed tokens that start with *prefix* (excluding *prefix* itself.)
+        """
+        tokens = []
+        position = bisect_right(self._sorted_tokens, prefix)
+        while position < len(self._sorted_tokens):
+            token = self._sorted_tokens[position]
+            if not token.startswith(prefix):
+                break
+            tokens.append(token)
+            position += 1
+        return tokens
+
+    def _get_similar_tokens(self, query_token):
+        """
+        Return list of (token, similarity) for indexed tokens
+        that share enough trigrams with *query_token*.
+        """
+        trigrams = self.get_trigrams(query_token)
+        shared = {}
+        for trigram in trigrams:
+            for token in self._trigrams.get(trigram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        similar = []
+        for token, count in shared.items():
+            # Dice coefficient: padded token of length N has N trigrams.
+            similarity = 2.0 * count / (len(trigrams) + len(token))
+            if similarity >= SearchIndex.MIN_SIMILARITY:
+                similar.append((token, similarity))
+        return similar
+
+    def _match_token(self, query_token):
+        """
+        Return dict of track indexes & scores for a single query token.
+        """
+        matches = [(query_token, SearchIndex.MATCH_EXACT)]
+        matches.extend(
+            (token, SearchIndex.MATCH_PREFIX)
+            for token
+            in self._get_prefixed_tokens(query_token)
+        )
+        if len(query_token) >= SearchIndex.MIN_FUZZY_TOKEN_LEN:
+            matches.extend(
+                (token, SearchIndex.MATCH_FUZZY * similarity)
+                for token, similarity
+                in self._get_similar_tokens(query_token)
+                if not token.startswith(query_token)
+            )
+
+        scores = {}
+        for token, quality in matches:
+            for index, weight in self._postings.get(token, {}).items():
+                score = quality * weight
+                if scores.get(index, 0) < score:
+                    scores[index] = score
+        return scores
+
+    def search(self, query, limit=100):
+        """
+        Return up to *limit* tracks matching *query*, best matches first.
+        """
+        scores = None
+        for query_token in set(self.tokenize(query)):
+            token_scores = self._match_token(query_token)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    index: score + token_scores[index]
+                    for index, score
+                    in scores.items()
+                    if index in token_scores
+                }
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.tracks[index] for index, _ in ranked[:limit]]
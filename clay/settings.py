@@ -9,6 +9,10 @@ import yaml
 import appdirs
 import pkg_resources
 
+from clay.cache import CacheManager, POOL_AUDIO, POOL_ART
+
+MEGABYTE = 1024 * 1024
+
 
 class _SettingsEditor(dict):
     """
@@ -43,7 +47,7 @@ class _Settings(object):
     def __init__(self):
         self._config = {}
         self._default_config = {}
-        self._cached_files = set()
+        self._cache = None
 
         self._config_dir = None
         self._config_file_path = None
@@ -95,12 +99,14 @@ class _Settings(object):
         else:
             self.colours_config = yaml.load(pkg_resources.resource_string(__name__, "colours.yaml"))
 
-
     def _load_cache(self):
         """
-        Load cached files.
+        Load cached files index.
         """
-        self._cached_files = set(os.listdir(self._cache_dir))
+        self._cache = CacheManager(self._cache_dir, {
+            POOL_AUDIO: (self.get('cache_audio_limit_mb', 'clay_settings') or 0) * MEGABYTE,
+            POOL_ART: (self.get('cache_art_limit_mb', 'clay_settings') or 0) * MEGABYTE
+        })
 
     def _commit_edits(self, config):
         """
@@ -121,7 +127,7 @@ class _Settings(object):
         section = self.get_section(*sections)
 
         try:
-            return section.get(key)
+            return section[key]
         except (KeyError, TypeError):
             section = self.get_default_config_section(*sections)
             return section.get(key)
@@ -169,20 +175,39 @@ class _Settings(object):
         """
         return _SettingsEditor(self._config, self._commit_edits)
 
+    def get_cache_dir(self):
+        """
+        Return path to cache directory.
+        """
+        return self._cache_dir
+
     def get_cached_file_path(self, filename):
         """
         Get full path to cached file.
         """
-        path = os.path.join(self._cache_dir, filename)
-        if os.path.exists(path):
-            return path
-        return None
+        return self._cache.get_path(filename)
 
     def get_is_file_cached(self, filename):
         """
         Return ``True`` if *filename* is present in cache.
         """
-        return filename in self._cached_files
+        return self._cache.contains(filename)
+
+    def get_partial_file_path(self, filename):
+        """
+        Return path to partially downloaded file for *filename*.
+        """
+        return os.path.join(self._cache_dir, filename + '.part')
+
+    def commit_partial_file(self, filename):
+        """
+        Atomically move fully downloaded file into cache.
+        """
+        os.rename(
+            self.get_partial_file_path(filename),
+            os.path.join(self._cache_dir, filename)
+        )
+        return self._cache.register(filename)
 
     def save_file_to_cache(self, filename, content):
         """
@@ -191,8 +216,37 @@ class _Settings(object):
         path = os.path.join(self._cache_dir, filename)
         with open(path, 'wb') as cachefile:
             cachefile.write(content)
-        self._cached_files.add(filename)
-        return path
+        return self._cache.register(filename)
+
+    def get_cache_stats(self):
+        """
+        Return a dict of cache pool names & their sizes in bytes.
+        """
+        return self._cache.get_stats()
+
+    def get_cache_budget(self, pool):
+        """
+        Return byte budget of cache pool, ``0`` if it is unlimited.
+        """
+        return self._cache.budgets.get(pool) or 0
+
+    def set_pinned_cache_files(self, filenames):
+        """
+        Protect cached *filenames* from eviction.
+        """
+        self._cache.set_pinned(filenames)
+
+    def get_pinned_cache_size(self, pool):
+        """
+        Return total size in bytes of pinned files in cache pool.
+        """
+        return self._cache.get_pinned_size(pool)
+
+    def flush_cache_index(self):
+        """
+        Write pending cache index changes to disk.
+        """
+        self._cache.flush()
 
 
 settings = _Settings()  # pylint: disable=invalid-name
@@ -0,0 +1,176 @@
+"""
+Persistent on-disk snapshot of "My library".
+"""
+# pylint: disable=broad-except
+from datetime import datetime
+from hashlib import sha1
+from threading import Lock
+import json
+import os
+
+from clay.log import logger
+
+
+class LibrarySnapshot(object):
+    """
+    Versioned on-disk copy of library track data.
+
+    Keeps only the fields that are needed to construct :class:`clay.gp.Track`
+    instances and remembers the timestamp of the latest change it has seen,
+    so that only newer changes need to be fetched from the server.
+    """
+    VERSION = 1
+    FILENAME = 'library-{}.json'
+
+    FIELDS = (
+        'id',
+        'nid',
+        'storeId',
+        'trackType',
+        'title',
+        'artist',
+        'album',
+        'durationMillis',
+        'rating',
+        'explicitType',
+        'artistArtRef',
+        'albumArtRef',
+        'lastRatingChangeTimestamp',
+        'lastModifiedTimestamp',
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self.is_stale = False
+        self._items = {}
+        self._order = []
+        self._updated_at = 0
+        self._is_loaded = False
+        self._lock = Lock()
+
+    @classmethod
+    def for_account(cls, cache_dir, account):
+        """
+        Return snapshot of *account* (email or device ID) stored in *cache_dir*.
+        """
+        account_hash = sha1((account or '').encode('utf-8')).hexdigest()[:16]
+        return cls(os.path.join(cache_dir, cls.FILENAME.format(account_hash)))
+
+    def load(self):
+        """
+        Read snapshot from disk (only once).
+
+        Return ``True`` if snapshot contains any tracks.
+        """
+        with self._lock:
+            if not self._is_loaded:
+                self._is_loaded = True
+                self._read()
+            return bool(self._items)
+
+    def _read(self):
+        """
+        Parse snapshot file. Snapshots with unknown versions are ignored.
+        """
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as snapshot_file:
+                data = json.load(snapshot_file)
+        except Exception as error:
+            logger.error('Failed to read library snapshot: %s', repr(error))
+            return
+        if data.get('version') != LibrarySnapshot.VERSION:
+            logger.debug('Ignoring library snapshot with version %s', data.get('version'))
+            return
+        self._updated_at = data['updated_at']
+        self._order = [item['id'] for item in data['tracks']]
+        self._items = {item['id']: item for item in data['tracks']}
+        logger.debug('Loaded %s tracks from library snapshot', len(self._items))
+
+    def save(self):
+        """
+        Write snapshot to disk atomically.
+        """
+        with self._lock:
+            data = dict(
+                version=LibrarySnapshot.VERSION,
+                updated_at=self._updated_at,
+                tracks=[self._items[item_id] for item_id in self._order]
+            )
+            temp_path = self.path + '.tmp'
+            try:
+                with open(temp_path, 'w') as snapshot_file:
+                    json.dump(data, snapshot_file, separators=(',', ':'))
+                os.rename(temp_path, self.path)
+            except Exception as error:
+                logger.error('Failed to write library snapshot: %s', repr(error))
+
+    @property
+    def is_empty(self):
+        """
+        Return ``True`` if snapshot was never filled.
+        """
+        return not self._updated_at
+
+    @property
+    def updated_after(self):
+        """
+        Return :class:`datetime.datetime` of the latest change in this snapshot.
+        """
+        return datetime.fromtimestamp(self._updated_at / 1000000.0)
+
+    def get_items(self):
+        """
+        Return list of track data dicts in server order.
+        """
+        return [self._items[item_id] for item_id in self._order]
+
+    def mark_stale(self):
+        """
+        Mark snapshot as requiring a sync with the server.
+        """
+        self.is_stale = True
+
+    def _compact(self, item):
+        """
+        Strip track data down to :attr:`.FIELDS` & track the latest change timestamp.
+        """
+        self._updated_at = max(self._updated_at, int(item.get('lastModifiedTimestamp', 0)))
+        return {key: item[key] for key in LibrarySnapshot.FIELDS if key in item}
+
+    def replace(self, items):
+        """
+        Replace all tracks in this snapshot with *items*.
+        """
+        with self._lock:
+            self._updated_at = 0
+            self._items = {item['id']: self._compact(item) for item in items}
+            self._order = [item['id'] for item in items]
+            self.is_stale = False
+
+    def merge(self, items):
+        """
+        Merge changed track data into this snapshot.
+        Items that have ``deleted`` flag set are removed.
+
+        Return a set of IDs of changed or removed tracks.
+        """
+        with self._lock:
+            changed_ids = set()
+            for item in items:
+                item_id = item['id']
+                changed_ids.add(item_id)
+                if item.get('deleted', False):
+                    self._items.pop(item_id, None)
+                    self._updated_at = max(
+                        self._updated_at, int(item.get('lastModifiedTimestamp', 0))
+                    )
+                    continue
+                if item_id not in self._items:
+                    self._order.append(item_id)
+                self._items[item_id] = self._compact(item)
+            if changed_ids:
+                self._order = [item_id for item_id in self._order if item_id in self._items]
+            self.is_stale = False
+            return changed_ids
@@ -4,7 +4,7 @@ Components for song listing.
 # pylint: disable=too-many-arguments
 # pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-public-methods
-from operator import lt, gt
+from bisect import bisect_left, bisect_right
 from string import digits
 
 try:
@@ -78,9 +78,9 @@ class SongListItem(urwid.Pile):
     }
 
     def __init__(self, track):
-        self.track = track
-        self.rating = self.RATING_ICONS[track.rating]
-        self.explicit = self.EXPLICIT_ICONS[track.explicit_rating]
+        self.track = None
+        self.rating = None
+        self.explicit = None
         self.index = 0
         self.state = SongListItem.STATE_IDLE
         self.line1_left = urwid.SelectableIcon('', cursor_position=1000)
@@ -107,6 +107,18 @@ class SongListItem(urwid.Pile):
         super(SongListItem, self).__init__([
             self.content
         ])
+        self.set_track(track)
+
+    def set_track(self, track, index=0, state=STATE_IDLE):
+        """
+        Attach a track to this item.
+        Used to recycle items when song list is scrolled.
+        """
+        self.track = track
+        self.rating = self.RATING_ICONS[track.rating]
+        self.explicit = self.EXPLICIT_ICONS[track.explicit_rating]
+        self.index = index
+        self.state = state
         self.update_text()
 
     def set_state(self, state):
@@ -162,12 +174,26 @@ class SongListItem(urwid.Pile):
         """
         Return song artist and title.
         """
+        return self.get_full_title(self.track)
+
+    @classmethod
+    def get_full_title(cls, track):
+        """
+        Return artist, title and rating icon of *track*.
+        """
         return u'{} - {} {}'.format(
-            self.track.artist,
-            self.track.title,
-            self.rating
+            track.artist,
+            track.title,
+            cls.RATING_ICONS[track.rating]
         )
 
+    @staticmethod
+    def get_search_key(track):
+        """
+        Return normalized string that is matched against filter query.
+        """
+        return u'{} - {}'.format(track.artist, track.title).lower()
+
     def keypress(self, size, key):
         """
         Handle keypress.
@@ -401,6 +427,210 @@ class SongListBoxPopup(urwid.LineBox):
         urwid.emit_signal(self, 'close')
 
 
+class SongListWalker(urwid.ListWalker):
+    """
+    List walker that keeps a list of tracks and creates
+    :class:`.SongListItem` widgets only for the rows that are actually displayed.
+
+    Widgets of rows that are far away from focus are recycled.
+    Row states (see :meth:`.SongListItem.set_state`) are kept for all rows,
+    so recycled widgets are restored properly.
+
+    Rows are indexed by track IDs (on first lookup), so rows of a specific track
+    can be found without scanning the whole list.
+    """
+    MAX_ITEMS = 256
+
+    def __init__(self, connect_item):
+        self.tracks = []
+        self.focus = 0
+        self.placeholder = None
+        self._connect_item = connect_item
+        self._items = {}
+        self._spare_items = []
+        self._states = {}
+        # track ID -> row index or list of row indexes
+        self._rows_by_id = None
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def set_tracks(self, tracks, focus=0):
+        """
+        Replace all tracks.
+        """
+        self.placeholder = None
+        self._spare_items.extend(self._items.values())
+        self._items = {}
+        self._states = {}
+        self.tracks = list(tracks)
+        self._rows_by_id = None
+        self.focus = focus
+        self._modified()
+
+    def set_placeholder(self, widget):
+        """
+        Remove all tracks and display *widget* instead.
+        """
+        self.set_tracks([])
+        self.placeholder = widget
+        self._modified()
+
+    def append(self, track):
+        """
+        Append a track.
+        """
+        self.tracks.append(track)
+        if self._rows_by_id is not None:
+            self._index_rows(len(self.tracks) - 1)
+        self.placeholder = None
+        self._modified()
+
+    def remove(self, index):
+        """
+        Remove track at *index*. Rows that follow are shifted.
+        """
+        del self.tracks[index]
+        self._rows_by_id = None
+        self._spare_items.extend(self._items.values())
+        self._items = {}
+        self._states = {
+            (i if i < index else i - 1): state
+            for i, state
+            in self._states.items()
+            if i != index
+        }
+        if self.focus >= len(self.tracks):
+            self.focus = max(len(self.tracks) - 1, 0)
+        self._modified()
+
+    def _index_rows(self, start):
+        """
+        Add rows starting from *start* to row index.
+        Rows are indexed by all IDs compared by :meth:`clay.gp.Track.__eq__`.
+        """
+        rows_by_id = self._rows_by_id
+        for index in range(start, len(self.tracks)):
+            track = self.tracks[index]
+            for key in (track.library_id, track.store_id, track.playlist_item_id):
+                if key is None:
+                    continue
+                # Most tracks appear once, so single index is stored as int.
+                rows = rows_by_id.get(key)
+                if rows is None:
+                    rows_by_id[key] = index
+                elif isinstance(rows, list):
+                    rows.append(index)
+                else:
+                    rows_by_id[key] = [rows, index]
+
+    def get_track_rows(self, track):
+        """
+        Return sorted indexes of rows that display *track*.
+        """
+        if self._rows_by_id is None:
+            self._rows_by_id = {}
+            self._index_rows(0)
+        rows = set()
+        for key in (track.library_id, track.store_id, track.playlist_item_id):
+            if key is None:
+                continue
+            key_rows = self._rows_by_id.get(key)
+            if isinstance(key_rows, list):
+                rows.update(key_rows)
+            elif key_rows is not None:
+                rows.add(key_rows)
+        return sorted(rows)
+
+    def get_active_rows(self):
+        """
+        Return indexes of rows that are not idle.
+        """
+        return list(self._states)
+
+    def get_state(self, index):
+        """
+        Return state of a row.
+        """
+        return self._states.get(index, SongListItem.STATE_IDLE)
+
+    def set_state(self, index, state):
+        """
+        Set state of a row & update its widget if it exists.
+        """
+        if state == SongListItem.STATE_IDLE:
+            self._states.pop(index, None)
+        else:
+            self._states[index] = state
+        item = self._items.get(index)
+        if item is not None:
+            item.set_state(state)
+
+    def get_item(self, index):
+        """
+        Return widget for row at *index*, creating or recycling it if needed.
+        """
+        item = self._items.get(index)
+        if item is not None:
+            return item
+
+        if len(self._items) >= SongListWalker.MAX_ITEMS:
+            self._recycle_distant_items()
+
+        track = self.tracks[index]
+        if self._spare_items:
+            item = self._spare_items.pop()
+            item.set_track(track, index, self.get_state(index))
+        else:
+            item = SongListItem(track)
+            item.set_track(track, index, self.get_state(index))
+            self._connect_item(item)
+        self._items[index] = item
+        return item
+
+    def _recycle_distant_items(self):
+        """
+        Move half of widgets that are farthest from focus into spare items.
+        """
+        indexes = sorted(self._items, key=lambda index: abs(index - self.focus))
+        for index in indexes[len(indexes) // 2:]:
+            self._spare_items.append(self._items.pop(index))
+
+    def get_focus(self):
+        if self.placeholder is not None:
+            return self.placeholder, 0
+        if not self.tracks:
+            return None, None
+        return self.get_item(self.focus), self.focus
+
+    def set_focus(self, position):
+        """
+        Focus track at *position*, clamped to the list bounds.
+        """
+        if not self.tracks:
+            return
+        self.focus = max(0, min(position, len(self.tracks) - 1))
+        self._modified()
+
+    def get_next(self, position):
+        if position + 1 >= len(self.tracks):
+            return None, None
+        return self.get_item(position + 1), position + 1
+
+    def get_prev(self, position):
+        if position <= 0 or position > len(self.tracks):
+            return None, None
+        return self.get_item(position - 1), position - 1
+
+    def positions(self, reverse=False):
+        """
+        Return iterable of all positions.
+        """
+        if reverse:
+            return range(len(self.tracks) - 1, -1, -1)
+        return range(len(self.tracks))
+
+
 class SongListBox(urwid.Frame):
     """
     Displays :class:`.SongListItem` instances.
@@ -411,11 +641,10 @@ class SongListBox(urwid.Frame):
         self.app = app
 
         self.current_item = None
-        self.tracks = []
-        self.walker = urwid.SimpleFocusListWalker([])
+        self.walker = SongListWalker(self._connect_item)
 
-        player.track_changed += self.track_changed
-        player.media_state_changed += self.media_state_changed
+        player.track_changed.add_ui_handler(self.track_changed)
+        player.media_state_changed.add_ui_handler(self.media_state_changed)
 
         self.list_box = urwid.ListBox(self.walker)
         self.filter_prefix = '> '
@@ -440,6 +669,8 @@ class SongListBox(urwid.Frame):
         )
 
         self._is_filtering = False
+        self._search_keys = None
+        self._filter_results = []
         self.popup = None
 
         super(SongListBox, self).__init__(
@@ -468,20 +699,46 @@ class SongListBox(urwid.Frame):
         matches = self.get_filtered_items()
         self.filter_info.set_text('{} matches'.format(len(matches)))
         if matches:
-            self.walker.set_focus(matches[0].index)
+            self.walker.set_focus(matches[0])
 
     def get_filtered_items(self):
         """
-        Get song items that match the search query.
+        Get sorted indexes of songs that match the search query.
+
+        Results for previous queries are kept, so typing another character
+        only narrows down the matches of the query before it.
         """
-        matches = []
-        for songitem in self.walker:
-            if not isinstance(songitem, SongListItem):
-                continue
-            if self.filter_query.lower() in songitem.full_title.lower():
-                matches.append(songitem)
+        query = self.filter_query.lower()
+        if self._search_keys is None:
+            self._search_keys = [
+                SongListItem.get_search_key(track)
+                for track
+                in self.walker.tracks
+            ]
+
+        # Drop results that are not prefixes of current query (e.g. after backspace).
+        while self._filter_results and not query.startswith(self._filter_results[-1][0]):
+            self._filter_results.pop()
+
+        if self._filter_results:
+            previous_query, candidates = self._filter_results[-1]
+            if previous_query == query:
+                return candidates
+        else:
+            candidates = range(len(self._search_keys))
+
+        keys = self._search_keys
+        matches = [index for index in candidates if query in keys[index]]
+        self._filter_results.append((query, matches))
         return matches
 
+    def invalidate_search_index(self):
+        """
+        Forget search keys and filter results. Called when tracks are changed.
+        """
+        self._search_keys = None
+        self._filter_results = []
+
     def end_filtering(self):
         """
         Exit filtering mode.
@@ -491,46 +748,43 @@ class SongListBox(urwid.Frame):
         ]
         self._is_filtering = False
 
+    @property
+    def tracks(self):
+        """
+        Return list of tracks displayed in this song list.
+        """
+        return self.walker.tracks
+
     def set_placeholder(self, text):
         """
         Clear list and add one placeholder item.
         """
-        self.walker[:] = [urwid.Text(text, align='center')]
+        self.walker.set_placeholder(urwid.Text(text, align='center'))
+        self.invalidate_search_index()
 
-    def tracks_to_songlist(self, tracks):
+    def _connect_item(self, songitem):
         """
-        Convert list of track data items into list of :class:`.SongListItem` instances.
+        Connect signals of a newly created :class:`.SongListItem`.
         """
-        current_track = player.get_current_track()
-        items = []
-        current_index = None
-        for index, track in enumerate(tracks):
-            songitem = SongListItem(track)
-            if current_track is not None and current_track == track:
-                songitem.set_state(SongListItem.STATE_LOADING)
-                if current_index is None:
-                    current_index = index
-            urwid.connect_signal(
-                songitem, 'activate', self.item_activated
-            )
+        urwid.connect_signal(
+            songitem, 'activate', self.item_activated
+        )
 
-            urwid.connect_signal(
-                songitem, 'play', self.item_play_pause
-            )
-            urwid.connect_signal(
-                songitem, 'append-requested', self.item_append_requested
-            )
-            urwid.connect_signal(
-                songitem, 'unappend-requested', self.item_unappend_requested
-            )
-            urwid.connect_signal(
-                songitem, 'station-requested', self.item_station_requested
-            )
-            urwid.connect_signal(
-                songitem, 'context-menu-requested', self.context_menu_requested
-            )
-            items.append(songitem)
-        return (items, current_index)
+        urwid.connect_signal(
+            songitem, 'play', self.item_play_pause
+        )
+        urwid.connect_signal(
+            songitem, 'append-requested', self.item_append_requested
+        )
+        urwid.connect_signal(
+            songitem, 'unappend-requested', self.item_unappend_requested
+        )
+        urwid.connect_signal(
+            songitem, 'station-requested', self.item_station_requested
+        )
+        urwid.connect_signal(
+            songitem, 'context-menu-requested', self.context_menu_requested
+        )
 
     def item_play_pause(self, songitem):
         """
@@ -605,14 +859,14 @@ class SongListBox(urwid.Frame):
         Called when new track playback is started.
         Marks corresponding song item (if found in this song list) as currently played.
         """
-        for i, songitem in enumerate(self.walker):
-            if isinstance(songitem, urwid.Text):
-                continue
-            if songitem.track == track:
-                songitem.set_state(SongListItem.STATE_LOADING)
-                self.walker.set_focus(i)
-            elif songitem.state != SongListItem.STATE_IDLE:
-                songitem.set_state(SongListItem.STATE_IDLE)
+        rows = self.walker.get_track_rows(track)
+        for i in self.walker.get_active_rows():
+            if i not in rows:
+                self.walker.set_state(i, SongListItem.STATE_IDLE)
+        for i in rows:
+            self.walker.set_state(i, SongListItem.STATE_LOADING)
+        if rows:
+            self.walker.set_focus(rows[-1])
 
     def media_state_changed(self, is_loading, is_playing):
         """
@@ -623,54 +877,45 @@ class SongListBox(urwid.Frame):
         if current_track is None:
             return
 
-        for songitem in self.walker:
-            if isinstance(songitem, urwid.Text):
-                continue
-            if songitem.track == current_track:
-                songitem.set_state(
-                    SongListItem.STATE_LOADING
-                    if is_loading
-                    else SongListItem.STATE_PLAYING
-                    if is_playing
-                    else SongListItem.STATE_PAUSED
-                )
+        for i in self.walker.get_track_rows(current_track):
+            self.walker.set_state(
+                i,
+                SongListItem.STATE_LOADING
+                if is_loading
+                else SongListItem.STATE_PLAYING
+                if is_playing
+                else SongListItem.STATE_PAUSED
+            )
         self.app.redraw()
 
     def populate(self, tracks):
         """
         Display a list of :class:`clay.player.Track` instances in this song list.
         """
-        self.tracks = tracks
-        self.walker[:], current_index = self.tracks_to_songlist(self.tracks)
-        self.update_indexes()
-        if current_index is not None:
-            self.walker.set_focus(current_index)
-        elif len(self.walker) >= 1:
-            self.walker.set_focus(0)
+        self.walker.set_tracks(tracks)
+        self.invalidate_search_index()
+        current_track = player.get_current_track()
+        if current_track is None:
+            return
+        rows = self.walker.get_track_rows(current_track)
+        if rows:
+            self.walker.set_state(rows[0], SongListItem.STATE_LOADING)
+            self.walker.set_focus(rows[0])
 
     def append_track(self, track):
         """
-        Convert a track into :class:`.SongListItem` instance and appends it into this song list.
+        Append a track to this song list.
         """
-        tracks, _ = self.tracks_to_songlist([track])
-        self.walker.append(tracks[0])
-        self.update_indexes()
+        self.walker.append(track)
+        self.invalidate_search_index()
 
     def remove_track(self, track):
         """
-        Remove a song item that matches *track* from this song list (if found).
-        """
-        for songlistitem in self.walker:
-            if songlistitem.track == track:
-                self.walker.remove(songlistitem)
-        self.update_indexes()
-
-    def update_indexes(self):
-        """
-        Update indexes of all song items in this song list.
+        Remove all rows that match *track* from this song list (if found).
         """
-        for i, songlistitem in enumerate(self.walker):
-            songlistitem.set_index(i)
+        for i in reversed(self.walker.get_track_rows(track)):
+            self.walker.remove(i)
+        self.invalidate_search_index()
 
     def keypress(self, size, key):
         if key in ascii_letters + digits + ' _-.,?!()[]/':
@@ -697,46 +942,48 @@ class SongListBox(urwid.Frame):
     def move_to_beginning(self):
         """Move to the focus to beginning of the songlist"""
         matches, _ = self._get_filtered()
-        self.list_box.set_focus(matches[0].index, 'below')
+        self.list_box.set_focus(matches[0], 'below')
         return False
 
     def move_to_end(self):
         """Move to the focus to end of the songlist"""
         matches, _ = self._get_filtered()
-        self.list_box.set_focus(matches[-1].index, 'above')
+        self.list_box.set_focus(matches[-1], 'above')
         return False
 
     def move_up(self):
         """Move the focus an item up in the playlist"""
         matches, index = self._get_filtered()
-        self.list_box.set_focus(*self.get_item(matches, index, lt))
+        self.list_box.set_focus(*self.get_prev_item(matches, index))
         return False
 
     def move_down(self):
         """Move the focus an item down in the playlist """
         matches, index = self._get_filtered()
-        self.list_box.set_focus(*self.get_item(matches, index, gt))
+        self.list_box.set_focus(*self.get_next_item(matches, index))
         return False
 
     @staticmethod
-    def get_item(matches, current_index, callback):
+    def get_prev_item(matches, current_index):
         """
-        Get an item index from the matches list
+        Get index of the closest match above *current_index* (wrapping around)
+        and a focus direction for it.
         """
-        # Some not so very nice code to get to be nice and generic
-        order = ['above', 'below']
-        if callback is lt:
-            order.reverse()
+        position = bisect_left(matches, current_index)
+        if position > 0:
+            return matches[position - 1], 'below'
+        return matches[-1], 'above'
 
-        items = [item for item in matches if callback(item.index, current_index)]
-
-        # Please witness some terrible code below.
-
-        index = -1 if callback is lt else 0
-
-        if items:
-            return items[index].index, order[0]
-        return matches[index].index, order[1]
+    @staticmethod
+    def get_next_item(matches, current_index):
+        """
+        Get index of the closest match below *current_index* (wrapping around)
+        and a focus direction for it.
+        """
+        position = bisect_right(matches, current_index)
+        if position < len(matches):
+            return matches[position], 'above'
+        return matches[0], 'below'
 
     def mouse_event(self, size, event, button, col, row, focus):
         """
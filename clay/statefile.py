@@ -0,0 +1,66 @@
+"""
+Background writer of playback state file.
+"""
+# pylint: disable=broad-except
+from threading import Thread, Lock, Event
+import json
+import os
+import time
+
+from clay.log import logger
+
+
+class StateFileWriter(object):
+    """
+    Writes latest playback state into a JSON file on a background thread.
+
+    Updates are coalesced: file is written at most *max_rate* times per second,
+    only when data has changed, and is replaced atomically so that readers
+    never see a partially written file.
+    """
+    def __init__(self, path, max_rate):
+        self.path = path
+        self.min_interval = 1.0 / max_rate
+        self._data = None
+        self._written_data = None
+        self._lock = Lock()
+        self._has_update = Event()
+        self._thread = None
+
+    def update(self, data):
+        """
+        Schedule *data* to be written.
+        """
+        with self._lock:
+            self._data = data
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='clay-state-writer')
+                self._thread.daemon = True
+                self._thread.start()
+        self._has_update.set()
+
+    def _run(self):
+        """
+        Writer thread body.
+        """
+        while True:
+            self._has_update.wait()
+            self._has_update.clear()
+            with self._lock:
+                data = self._data
+            if data != self._written_data:
+                self._write(data)
+                self._written_data = data
+            time.sleep(self.min_interval)
+
+    def _write(self, data):
+        """
+        Replace state file with *data*.
+        """
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(temp_path, 'w') as statefile:
+                statefile.write(json.dumps(data, indent=4))
+            os.rename(temp_path, self.path)
+        except Exception as error:
+            logger.error('Failed to write state file: %s', repr(error))
@@ -0,0 +1,282 @@
+"""
+Local HTTP server that lets libVLC play tracks while they are being saved into cache.
+"""
+# pylint: disable=broad-except
+from threading import Thread, Lock, Condition
+import io
+import os
+import re
+import time
+
+try:  # Python 3.x
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import quote, unquote
+except ImportError:  # Python 2.x
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import quote, unquote
+
+from clay.gp import gp
+from clay.log import logger
+from clay.settings import settings
+
+CHUNK_SIZE = 64 * 1024
+# Number of seconds to wait for more data before checking download state again
+POLL_INTERVAL = 0.5
+# Number of seconds to wait for download to report file size before serving it without one
+START_TIMEOUT = 10
+RANGE_RE = re.compile(r'^bytes=(\d+)-$')
+
+
+class _TeeStream(object):
+    """
+    Track that is being downloaded into cache.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.total = None
+        self.is_finished = False
+        self.error = None
+        self.condition = Condition()
+
+    def update(self, _, total):
+        """
+        Called by downloader whenever data is written into partial file.
+        """
+        with self.condition:
+            self.total = total
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        """
+        Called once download is finished or has failed with *error*.
+        """
+        with self.condition:
+            self.is_finished = True
+            self.error = error
+            self.condition.notify_all()
+
+    def wait_for_total(self):
+        """
+        Wait until download reports file size or finishes and return file size,
+        ``None`` if it is unknown.
+        """
+        deadline = time.time() + START_TIMEOUT
+        with self.condition:
+            while self.total is None and not self.is_finished and time.time() < deadline:
+                self.condition.wait(POLL_INTERVAL)
+            if self.total is not None or self.error is not None:
+                return self.total
+        path = os.path.join(settings.get_cache_dir(), self.filename)
+        if self.is_finished and os.path.exists(path):
+            return os.path.getsize(path)
+        return None
+
+    def open(self):
+        """
+        Open partial file (or cached file once download is complete) for reading.
+        Return ``None`` if neither exists.
+        """
+        for path in (
+                settings.get_partial_file_path(self.filename),
+                os.path.join(settings.get_cache_dir(), self.filename)
+        ):
+            try:
+                return io.open(path, 'rb')
+            except IOError:
+                pass
+        return None
+
+    def read(self, source, size):
+        """
+        Read up to *size* bytes from *source*, waiting for them to be downloaded.
+        Return empty bytes once download is finished and there is no more data.
+        """
+        while True:
+            data = source.read(size)
+            if data:
+                return data
+            with self.condition:
+                if self.is_finished:
+                    break
+                self.condition.wait(POLL_INTERVAL)
+        return source.read(size)
+
+
+class _TeeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves a track that is being downloaded, supports ``Range: bytes=<offset>-`` requests.
+    """
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Handle GET request.
+        """
+        stream = self.server.tee.get_stream(unquote(self.path.lstrip('/')))
+        if stream is None:
+            self.send_error(404)
+            return
+
+        total = stream.wait_for_total()
+        source = stream.open()
+        if source is None:
+            self.send_error(502)
+            return
+
+        with source:
+            offset = self._get_offset(total)
+            if offset is None:
+                self.send_error(416)
+                return
+            self._send_headers(offset, total)
+            source.seek(offset)
+            self._send_body(stream, source, total - offset if total is not None else None)
+
+    def _get_offset(self, total):
+        """
+        Return offset requested with ``Range`` header (``0`` if there is none),
+        ``None`` if it is beyond file size of *total* bytes.
+        Ranges are ignored while file size is unknown.
+        """
+        match = RANGE_RE.match(self.headers.get('Range') or '')
+        if not match or total is None:
+            return 0
+        offset = int(match.group(1))
+        if offset >= total:
+            return None
+        return offset
+
+    def _send_headers(self, offset, total):
+        """
+        Send status & headers of response that starts at *offset* of file of *total* bytes.
+        """
+        if offset:
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(offset, total - 1, total))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        if total is not None:
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Length', str(total - offset))
+        self.end_headers()
+
+    def _send_body(self, stream, source, remaining):
+        """
+        Send *remaining* bytes (until download ends if ``None``) of *stream* from *source*.
+        """
+        try:
+            while remaining is None or remaining > 0:
+                chunk = stream.read(source, CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+        except (IOError, OSError):
+            # Player has closed connection (e.g. to seek)
+            pass
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Log requests into debug log instead of stderr.
+        """
+        logger.debug('Tee server: ' + format, *args)
+
+
+class _TeeHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server that serves streams of *tee* and handles each request
+    on a separate daemon thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, server_address, tee):
+        HTTPServer.__init__(self, server_address, _TeeRequestHandler)
+        self.tee = tee
+
+
+class _TeeServer(object):
+    """
+    Downloads tracks into cache & serves them to libVLC over HTTP on loopback interface
+    while they are being downloaded, so that audio is fetched with a single request.
+
+    Singleton.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._server = None
+        self._streams = {}
+
+    def _get_server(self):
+        """
+        Return running HTTP server, start it if needed.
+        Return ``None`` if server could not be started.
+        """
+        with self._lock:
+            if self._server is None:
+                try:
+                    self._server = _TeeHTTPServer(('127.0.0.1', 0), self)
+                except Exception as error:
+                    logger.error('Failed to start tee server: %s', repr(error))
+                    return None
+                thread = Thread(target=self._server.serve_forever, name='clay-tee-server')
+                thread.daemon = True
+                thread.start()
+            return self._server
+
+    def get_stream(self, filename):
+        """
+        Return :class:`._TeeStream` for *filename*, ``None`` if it is not being served.
+        """
+        with self._lock:
+            return self._streams.get(filename)
+
+    def start(self, url, filename):
+        """
+        Start downloading *url* into cache as *filename* on a dedicated thread
+        and return local URL that serves the file while it is being downloaded.
+
+        Return ``None`` if local server could not be started.
+        """
+        server = self._get_server()
+        if server is None:
+            return None
+
+        with self._lock:
+            stream = self._streams.get(filename)
+            if stream is None or stream.is_finished:
+                # Tracks of finished streams are played from cache
+                self._streams = {
+                    key: value
+                    for key, value
+                    in self._streams.items()
+                    if not value.is_finished
+                }
+                stream = self._streams[filename] = _TeeStream(filename)
+                thread = Thread(
+                    target=self._download,
+                    args=(stream, url),
+                    name='clay-tee-{}'.format(filename)
+                )
+                thread.daemon = True
+                thread.start()
+
+        return 'http://127.0.0.1:{}/{}'.format(server.server_address[1], quote(filename))
+
+    @staticmethod
+    def _download(stream, url):
+        """
+        Download thread body.
+        """
+        try:
+            gp.save_stream_to_cache(url, stream.filename, on_progress=stream.update)
+        except Exception as error:
+            logger.error('Failed to download %s: %s', stream.filename, repr(error))
+            stream.finish(error)
+        else:
+            logger.debug('%s saved to cache', stream.filename)
+            stream.finish()
+
+
+tee_server = _TeeServer()  # pylint: disable=invalid-name
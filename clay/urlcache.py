@@ -0,0 +1,74 @@
+"""
+Cache of signed stream URLs that are reused until they expire.
+"""
+from threading import Lock
+import time
+
+try:  # Python 3.x
+    from urllib.parse import urlparse, parse_qs
+except ImportError:  # Python 2.x
+    from urlparse import urlparse, parse_qs
+
+# Number of seconds before expiry when URL is no longer considered valid
+EXPIRY_MARGIN = 60
+
+
+def get_url_expiry(url):
+    """
+    Return expiry timestamp of signed stream URL, ``0`` if it is unknown.
+    """
+    try:
+        return int(parse_qs(urlparse(url).query)['expire'][0])
+    except (KeyError, ValueError):
+        return 0
+
+
+def is_url_fresh(expires):
+    """
+    Return ``True`` if URL that expires at *expires* timestamp stays valid for a while.
+    """
+    return expires - EXPIRY_MARGIN > time.time()
+
+
+class URLCache(object):
+    """
+    Maps stream IDs to stream URLs. URLs without known expiry time are not cached.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        # stream ID -> (stream URL, expiry timestamp)
+        self._urls = {}
+
+    def get(self, stream_id):
+        """
+        Return fresh URL of *stream_id*, ``None`` if there is none.
+        """
+        with self._lock:
+            cached = self._urls.get(stream_id)
+        if cached is not None and is_url_fresh(cached[1]):
+            return cached[0]
+        return None
+
+    def put(self, stream_id, url):
+        """
+        Cache *url* of *stream_id* if its expiry time is known and drop expired URLs.
+        """
+        expires = get_url_expiry(url) if url else 0
+        if not expires:
+            return
+        with self._lock:
+            now = time.time()
+            self._urls = {
+                key: value
+                for key, value
+                in self._urls.items()
+                if value[1] > now
+            }
+            self._urls[stream_id] = (url, expires)
+
+    def clear(self):
+        """
+        Drop all cached URLs.
+        """
+        with self._lock:
+            self._urls = {}
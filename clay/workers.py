@@ -0,0 +1,202 @@
+"""
+Bounded pool of worker threads for background tasks.
+"""
+# pylint: disable=broad-except
+from itertools import count
+from threading import Thread, Lock, Event
+
+try:  # Python 3.x
+    from queue import PriorityQueue, Empty
+except ImportError:  # Python 2.x
+    from Queue import PriorityQueue, Empty
+
+from clay.log import logger
+from clay.settings import settings
+
+DEFAULT_WORKER_THREADS = 8
+
+PRIORITY_PLAYBACK = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_PLAYBACK: 'playback',
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_BACKGROUND: 'background',
+}
+
+_PRIORITY_SHUTDOWN = -1
+
+
+class Task(object):
+    """
+    Function call submitted with :meth:`WorkerPool.submit_task`.
+
+    Runs at most once: either on a worker thread or on a thread that
+    waits for it before any worker has picked it up.
+    """
+    def __init__(self, func, args, kwargs):
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = Lock()
+        self._is_started = False
+        self._finished = Event()
+        self._result = None
+        self._error = None
+
+    @property
+    def done(self):
+        """
+        Return ``True`` if task has finished.
+        """
+        return self._finished.is_set()
+
+    def run(self):
+        """
+        Call task function unless it was already called.
+        """
+        with self._lock:
+            if self._is_started:
+                return
+            self._is_started = True
+        try:
+            self._result = self._func(*self._args, **self._kwargs)
+        except Exception as error:
+            self._error = error
+        finally:
+            self._finished.set()
+
+    def wait(self):
+        """
+        Wait until task finishes and return its result (or raise its exception.)
+
+        If no worker has picked up the task yet, it is run on current thread,
+        so tasks that wait for other tasks can't exhaust the pool.
+        """
+        self.run()
+        self._finished.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class WorkerPool(object):
+    """
+    Runs submitted tasks on a limited number of threads named *name*-<index>.
+
+    Tasks with lower priority value are picked first.
+    Tasks with equal priority are picked in submission order.
+
+    Shared pool for API calls & other short tasks is :data:`.worker_pool`,
+    long-running downloads get pools of their own, so they never occupy it.
+    """
+    def __init__(self, size, name='clay-worker'):
+        self.size = size
+        self.name = name
+        self._queue = PriorityQueue()
+        self._counter = count()
+        self._lock = Lock()
+        self._threads = []
+        self._idle = 0
+        self._completed = 0
+        self._failed = 0
+        self._queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self._is_shut_down = False
+
+    def submit(self, priority, func, *args, **kwargs):
+        """
+        Schedule *func* to be called with *args* and *kwargs* on a worker thread.
+
+        Starts new worker thread if there are more queued tasks than idle threads
+        and pool is not full yet.
+        """
+        with self._lock:
+            if self._is_shut_down:
+                logger.debug('Worker pool is shut down, dropping %s', func)
+                return
+            self._queued[priority] += 1
+            if sum(self._queued.values()) > self._idle and len(self._threads) < self.size:
+                thread = Thread(
+                    target=self._work,
+                    name='{}-{}'.format(self.name, len(self._threads))
+                )
+                thread.daemon = True
+                self._threads.append(thread)
+                self._idle += 1
+                thread.start()
+            self._queue.put((priority, next(self._counter), func, args, kwargs))
+
+    def submit_task(self, priority, func, *args, **kwargs):
+        """
+        Same as :meth:`.submit`, but return a :class:`.Task` that can be waited for.
+        """
+        task = Task(func, args, kwargs)
+        self.submit(priority, task.run)
+        return task
+
+    def _work(self):
+        """
+        Worker thread body.
+        """
+        while True:
+            priority, _, func, args, kwargs = self._queue.get()
+            if priority == _PRIORITY_SHUTDOWN:
+                return
+            with self._lock:
+                self._idle -= 1
+                self._queued[priority] -= 1
+            try:
+                func(*args, **kwargs)
+            except Exception as error:
+                logger.error('Worker task %s failed: %s', func, repr(error))
+                with self._lock:
+                    self._failed += 1
+            with self._lock:
+                self._idle += 1
+                self._completed += 1
+
+    def get_stats(self):
+        """
+        Return a dict with pool metrics: thread counts, queue depths
+        (total and per priority) and number of completed & failed tasks.
+        """
+        with self._lock:
+            return dict(
+                threads=len(self._threads),
+                busy=len(self._threads) - self._idle,
+                queued=sum(self._queued.values()),
+                queued_by_priority={
+                    PRIORITY_NAMES[priority]: queued
+                    for priority, queued
+                    in self._queued.items()
+                },
+                completed=self._completed,
+                failed=self._failed
+            )
+
+    def shutdown(self, timeout=1.0):
+        """
+        Drop pending tasks and stop worker threads.
+
+        Waits at most *timeout* seconds for each running task to finish.
+        """
+        with self._lock:
+            if self._is_shut_down:
+                return
+            self._is_shut_down = True
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except Empty:
+                pass
+            self._queued = {priority: 0 for priority in PRIORITY_NAMES}
+            for _ in self._threads:
+                self._queue.put((_PRIORITY_SHUTDOWN, next(self._counter), None, None, None))
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+worker_pool = WorkerPool(  # pylint: disable=invalid-name
+    settings.get('worker_threads', 'clay_settings') or DEFAULT_WORKER_THREADS
+)
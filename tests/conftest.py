@@ -0,0 +1,12 @@
+"""
+Test configuration.
+
+Clay reads config from & writes cache into user directories on import,
+so they are pointed to a temporary directory before any Clay module is imported.
+"""
+import os
+import tempfile
+
+_ROOT = tempfile.mkdtemp(prefix='clay-tests-')
+os.environ['XDG_CONFIG_HOME'] = os.path.join(_ROOT, 'config')
+os.environ['XDG_CACHE_HOME'] = os.path.join(_ROOT, 'cache')
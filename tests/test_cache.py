@@ -0,0 +1,115 @@
+"""
+Tests for :mod:`clay.cache`.
+"""
+import io
+import os
+
+import pytest
+
+from clay import cache
+from clay.cache import CacheManager, POOL_AUDIO, POOL_ART
+
+
+class _Clock(object):
+    """
+    Replaces :mod:`time` in :mod:`clay.cache`, every call returns a later timestamp.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    monkeypatch.setattr(cache, 'time', _Clock())
+    return str(tmpdir)
+
+
+def _write(manager, filename, size=100):
+    with io.open(os.path.join(manager.cache_dir, filename), 'wb') as file_:
+        file_.write(b'x' * size)
+    return manager.register(filename)
+
+
+def _cached(manager, cache_dir, filenames):
+    return [
+        filename
+        for filename
+        in filenames
+        if manager.contains(filename) and os.path.exists(os.path.join(cache_dir, filename))
+    ]
+
+
+def test_evicts_least_recently_used_files(cache_dir):
+    manager = CacheManager(cache_dir, {POOL_AUDIO: 250})
+    _write(manager, 'a.mp3')
+    _write(manager, 'b.mp3')
+    assert manager.get_path('a.mp3') is not None
+    _write(manager, 'c.mp3')
+    assert _cached(manager, cache_dir, ['a.mp3', 'b.mp3', 'c.mp3']) == ['a.mp3', 'c.mp3']
+    assert manager.get_stats()[POOL_AUDIO] == 200
+
+
+def test_pools_have_separate_budgets(cache_dir):
+    manager = CacheManager(cache_dir, {POOL_AUDIO: 150, POOL_ART: 1000})
+    _write(manager, 'a.jpg')
+    _write(manager, 'a.mp3')
+    _write(manager, 'b.jpg')
+    _write(manager, 'b.mp3')
+    assert _cached(manager, cache_dir, ['a.jpg', 'a.mp3', 'b.jpg', 'b.mp3']) == \
+        ['a.jpg', 'b.jpg', 'b.mp3']
+
+
+def test_pinned_files_are_not_evicted(cache_dir):
+    manager = CacheManager(cache_dir, {POOL_AUDIO: 250})
+    _write(manager, 'a.mp3')
+    _write(manager, 'b.mp3')
+    manager.set_pinned(['a.mp3'])
+    _write(manager, 'c.mp3')
+    assert _cached(manager, cache_dir, ['a.mp3', 'b.mp3', 'c.mp3']) == ['a.mp3', 'c.mp3']
+    assert manager.get_pinned_size(POOL_AUDIO) == 100
+
+
+def test_registered_file_is_kept_even_if_over_budget(cache_dir):
+    manager = CacheManager(cache_dir, {POOL_AUDIO: 50})
+    _write(manager, 'a.mp3')
+    _write(manager, 'b.mp3')
+    assert _cached(manager, cache_dir, ['a.mp3', 'b.mp3']) == ['b.mp3']
+
+
+def test_unlimited_pool_is_not_evicted(cache_dir):
+    manager = CacheManager(cache_dir, {POOL_AUDIO: 0})
+    for name in 'abc':
+        _write(manager, name + '.mp3')
+    assert manager.get_stats()[POOL_AUDIO] == 300
+
+
+def test_missing_file_is_dropped_from_index(cache_dir):
+    manager = CacheManager(cache_dir, {})
+    path = _write(manager, 'a.mp3')
+    os.remove(path)
+    assert manager.get_path('a.mp3') is None
+    assert not manager.contains('a.mp3')
+    assert manager.get_stats()[POOL_AUDIO] == 0
+
+
+def test_index_is_reloaded(cache_dir):
+    manager = CacheManager(cache_dir, {})
+    _write(manager, 'a.mp3', 100)
+    _write(manager, 'a.jpg', 10)
+    manager.flush()
+    reloaded = CacheManager(cache_dir, {})
+    assert reloaded.contains('a.mp3')
+    assert reloaded.get_stats() == {POOL_AUDIO: 100, POOL_ART: 10}
+
+
+def test_index_is_rebuilt_from_directory(cache_dir):
+    for filename, size in (('a.mp3', 100), ('a.jpg', 10), ('notes.txt', 5)):
+        with io.open(os.path.join(cache_dir, filename), 'wb') as file_:
+            file_.write(b'x' * size)
+    manager = CacheManager(cache_dir, {})
+    assert manager.get_stats() == {POOL_AUDIO: 100, POOL_ART: 10}
+    assert not manager.contains('notes.txt')
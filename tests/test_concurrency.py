@@ -0,0 +1,166 @@
+"""
+Tests for :mod:`clay.concurrency`.
+"""
+from threading import Thread, Event
+
+import pytest
+
+from clay.concurrency import synchronized, single_flight, _KeyedLock
+
+
+def _start(func, *args, **kwargs):
+    """
+    Call *func* on a new thread, return the thread & a dict that receives its outcome.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = func(*args, **kwargs)
+        except Exception as error:  # pylint: disable=broad-except
+            outcome['error'] = error
+
+    thread = Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread, outcome
+
+
+class _Download(object):
+    """
+    Function decorated with :func:`clay.concurrency.single_flight`
+    that reports progress and blocks until released.
+    """
+    def __init__(self):
+        self.calls = []
+        self.started = Event()
+        self.release = Event()
+        self.error = None
+
+    @single_flight(key=lambda self, name, on_progress=None: name, progress='on_progress')
+    def fetch(self, name, on_progress=None):
+        self.calls.append(name)
+        on_progress(1, 10)
+        self.started.set()
+        self.release.wait(5)
+        on_progress(10, 10)
+        if self.error is not None:
+            raise self.error
+        return name.upper()
+
+
+def _join(download, name):
+    """
+    Call :meth:`_Download.fetch` on a new thread and wait until it joins running call.
+    Return the thread, its outcome & its progress reports.
+    """
+    joined = Event()
+    reports = []
+
+    def on_progress(done, total):
+        reports.append((done, total))
+        joined.set()
+
+    thread, outcome = _start(download.fetch, name, on_progress=on_progress)
+    assert joined.wait(5)
+    return thread, outcome, reports
+
+
+def test_concurrent_calls_share_execution():
+    download = _Download()
+    leader, leader_outcome = _start(download.fetch, 'a')
+    assert download.started.wait(5)
+    followers = [_join(download, 'a') for _ in range(3)]
+    download.release.set()
+    for thread, outcome, reports in [(leader, leader_outcome, None)] + followers:
+        thread.join(5)
+        assert outcome == {'result': 'A'}
+        if reports is not None:
+            # Followers start with the latest report & receive the following ones.
+            assert reports == [(1, 10), (10, 10)]
+    assert download.calls == ['a']
+
+
+def test_followers_receive_error():
+    download = _Download()
+    download.error = ValueError('broken')
+    leader, leader_outcome = _start(download.fetch, 'a')
+    assert download.started.wait(5)
+    follower, follower_outcome, _ = _join(download, 'a')
+    download.release.set()
+    leader.join(5)
+    follower.join(5)
+    assert leader_outcome['error'] is download.error
+    assert follower_outcome['error'] is download.error
+    assert download.calls == ['a']
+
+
+def test_calls_with_different_keys_run_separately():
+    download = _Download()
+    download.release.set()
+    assert download.fetch('a') == 'A'
+    assert download.fetch('b') == 'B'
+    assert download.fetch('a') == 'A'
+    assert download.calls == ['a', 'b', 'a']
+
+
+def test_leader_progress_callback_receives_reports():
+    download = _Download()
+    download.release.set()
+    reports = []
+    download.fetch('a', on_progress=lambda *args: reports.append(args))
+    assert reports == [(1, 10), (10, 10)]
+
+
+def test_keyed_lock_is_dropped_once_released():
+    locks = _KeyedLock()
+    locks.acquire('a')
+    locks.acquire('b')
+    locks.release('a')
+    assert list(locks._locks) == ['b']
+    locks.release('b')
+    assert locks._locks == {}
+
+
+@pytest.mark.parametrize('key, blocks', [('a', True), ('b', False)])
+def test_synchronized_blocks_calls_with_equal_keys(key, blocks):
+    entered = {'a': Event(), 'b': Event()}
+    release = Event()
+
+    @synchronized(key=lambda name: name)
+    def work(name):
+        entered[name].set()
+        if name == 'a':
+            release.wait(5)
+
+    first, _ = _start(work, 'a')
+    assert entered['a'].wait(5)
+    entered['a'].clear()
+    second, _ = _start(work, key)
+    assert entered[key].wait(0.2) is not blocks
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert entered[key].is_set()
+
+
+def test_synchronized_without_key_blocks_all_calls():
+    entered = Event()
+    release = Event()
+    calls = []
+
+    @synchronized
+    def work(name):
+        calls.append(name)
+        entered.set()
+        release.wait(5)
+
+    first, _ = _start(work, 'a')
+    assert entered.wait(5)
+    second, _ = _start(work, 'b')
+    second.join(0.2)
+    assert calls == ['a']
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert calls == ['a', 'b']
@@ -0,0 +1,161 @@
+"""
+Tests for :mod:`clay.eventhook`.
+"""
+from threading import Thread, current_thread
+import os
+import select
+
+import pytest
+
+from clay import eventhook
+from clay.eventhook import EventHook
+
+
+class _Loop(object):
+    """
+    Stand-in for :class:`urwid.MainLoop` that delivers calls when :meth:`.run_once` is called.
+    """
+    def __init__(self):
+        self.callback = None
+        self._read_fd = None
+
+    def watch_pipe(self, callback):
+        self.callback = callback
+        self._read_fd, write_fd = os.pipe()
+        return write_fd
+
+    def run_once(self, timeout=0):
+        """
+        Deliver queued calls, return number of wake-ups that were requested.
+        Waits at most *timeout* seconds for a wake-up.
+        """
+        wakeups = 0
+        if select.select([self._read_fd], [], [], timeout)[0]:
+            wakeups = len(os.read(self._read_fd, 1024))
+        self.callback(b'')
+        return wakeups
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    """
+    Dispatcher with a main loop that runs on another thread,
+    so calls made by test are queued.
+    """
+    dispatcher = eventhook._UIDispatcher()
+    monkeypatch.setattr(eventhook, 'ui_dispatcher', dispatcher)
+    loop = _Loop()
+    thread = Thread(target=dispatcher.set_loop, args=(loop,))
+    thread.start()
+    thread.join()
+    return loop
+
+
+def test_handlers_are_called_right_away_without_loop(monkeypatch):
+    monkeypatch.setattr(eventhook, 'ui_dispatcher', eventhook._UIDispatcher())
+    hook = EventHook()
+    calls = []
+    hook.add_ui_handler(calls.append)
+    hook.fire(1)
+    assert calls == [1]
+
+
+def test_ui_handlers_are_queued_for_main_loop(loop):
+    hook = EventHook()
+    calls = []
+    threads = []
+    hook += lambda value: threads.append(current_thread())
+    hook.add_ui_handler(calls.append)
+    hook.fire(1)
+    hook.fire(2)
+    assert threads == [current_thread()] * 2
+    assert calls == []
+    assert loop.run_once() == 1
+    assert calls == [1, 2]
+
+
+def test_repeated_events_are_collapsed(loop):
+    hook = EventHook(collapse=True)
+    calls = []
+    hook.add_ui_handler(lambda *args, **kwargs: calls.append((args, kwargs)))
+    hook.fire(1, done=False)
+    hook.fire(2, done=False)
+    hook.fire(3, done=True)
+    loop.run_once()
+    assert calls == [((3,), {'done': True})]
+
+
+def test_events_are_not_collapsed_across_other_calls(loop):
+    progress = EventHook(collapse=True)
+    finished = EventHook()
+    calls = []
+    progress.add_ui_handler(lambda value: calls.append(('progress', value)))
+    finished.add_ui_handler(lambda value: calls.append(('finished', value)))
+    progress.fire(1)
+    progress.fire(2)
+    finished.fire(3)
+    progress.fire(4)
+    progress.fire(5)
+    loop.run_once()
+    assert calls == [('progress', 2), ('finished', 3), ('progress', 5)]
+
+
+def test_events_are_collapsed_again_after_delivery(loop):
+    hook = EventHook(collapse=True)
+    calls = []
+    hook.add_ui_handler(calls.append)
+    hook.fire(1)
+    loop.run_once()
+    hook.fire(2)
+    hook.fire(3)
+    loop.run_once()
+    assert calls == [1, 3]
+
+
+def test_failing_handler_does_not_stop_delivery(loop):
+    hook = EventHook()
+    calls = []
+    hook.add_ui_handler(lambda value: 1 // value)
+    hook.add_ui_handler(calls.append)
+    hook.fire(0)
+    loop.run_once()
+    assert calls == [0]
+
+
+def _run_on_other_thread(func):
+    """
+    Call :meth:`clay.eventhook._UIDispatcher.run` on another thread,
+    return a thread & a dict that receives its outcome.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = eventhook.ui_dispatcher.run(func)
+        except Exception as error:  # pylint: disable=broad-except
+            outcome['error'] = error
+
+    thread = Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def test_run_waits_for_main_loop(loop):
+    threads = []
+
+    def func():
+        threads.append(current_thread())
+        return 42
+
+    thread, outcome = _run_on_other_thread(func)
+    assert loop.run_once(timeout=5) == 1
+    thread.join(5)
+    assert outcome == {'result': 42}
+    assert threads == [current_thread()]
+
+
+def test_run_raises_error_of_function(loop):
+    thread, outcome = _run_on_other_thread(lambda: 1 // 0)
+    assert loop.run_once(timeout=5) == 1
+    thread.join(5)
+    assert isinstance(outcome['error'], ZeroDivisionError)
@@ -0,0 +1,202 @@
+"""
+Tests for :mod:`clay.offline`.
+"""
+from threading import Lock, current_thread
+import time
+
+import pytest
+
+from clay import offline
+from clay.settings import settings, MEGABYTE
+
+
+class _Track(object):
+    """
+    Minimal stand-in for :class:`clay.gp.Track`.
+    """
+    def __init__(self, store_id):
+        self.store_id = store_id
+        self.library_id = None
+        self.duration = 1000
+
+    @property
+    def filename(self):
+        return self.store_id + '.mp3'
+
+
+class _Playlist(object):
+    """
+    Minimal stand-in for :class:`clay.gp.Playlist`.
+    """
+    def __init__(self, playlist_id, count):
+        self.id = playlist_id  # pylint: disable=invalid-name
+        self.name = 'Playlist ' + playlist_id
+        self.tracks = [_Track('{}-{}'.format(playlist_id, index)) for index in range(count)]
+
+
+class _Downloads(object):
+    """
+    Replaces API calls & cache of :mod:`clay.offline`, keeps track of downloads.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.cached = set()
+        self.pinned = set()
+        self.failing = set()
+        self.threads = set()
+        self.active = 0
+        self.max_active = 0
+        self.budget = 0
+
+    def save_stream_to_cache(self, url, filename):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.threads.add(current_thread().name)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+            if filename in self.failing:
+                raise IOError('connection reset')
+            self.cached.add(filename)
+
+    def set_pinned_cache_files(self, filenames):
+        self.pinned = set(filenames)
+
+    def get_pinned_cache_size(self, _):
+        return sum(
+            offline._OfflineTrack(filename[:-4], None, 1000).estimated_size
+            for filename
+            in self.pinned & self.cached
+        )
+
+
+@pytest.fixture
+def downloads(monkeypatch, tmpdir):
+    fake = _Downloads()
+    monkeypatch.setattr(type(offline.gp), 'is_subscribed', property(lambda self: True))
+    monkeypatch.setattr(offline.gp, 'get_stream_url', lambda stream_id: 'http://example.com/')
+    monkeypatch.setattr(offline.gp, 'save_stream_to_cache', fake.save_stream_to_cache)
+    monkeypatch.setattr(settings, 'get_cache_dir', lambda: str(tmpdir))
+    monkeypatch.setattr(settings, 'get_is_file_cached', lambda filename: filename in fake.cached)
+    monkeypatch.setattr(settings, 'set_pinned_cache_files', fake.set_pinned_cache_files)
+    monkeypatch.setattr(settings, 'get_pinned_cache_size', fake.get_pinned_cache_size)
+    monkeypatch.setattr(settings, 'get_cache_budget', lambda pool: fake.budget)
+    return fake
+
+
+@pytest.fixture
+def make_scheduler(downloads, monkeypatch):
+    """
+    Return a function that creates schedulers, progress messages are collected in their
+    ``messages`` attribute.
+    """
+    monkeypatch.setattr(
+        offline._OfflineScheduler, '_show_progress',
+        lambda self, message: self.__dict__.setdefault('messages', []).append(message)
+    )
+    schedulers = []
+
+    def make(concurrency=2):
+        scheduler = offline._OfflineScheduler(concurrency, 0)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        offline.gp.auth_state_changed -= scheduler._on_auth_state_changed
+        scheduler._download_pool.shutdown()
+
+
+def _wait_idle(scheduler):
+    """
+    Wait until scheduler has nothing to download & its download threads are idle.
+    """
+    deadline = time.time() + 5
+    while scheduler._active or (scheduler._queue and scheduler._stop_reason is None) or \
+            scheduler._download_pool.get_stats()['busy']:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_downloads_tracks_after_login(make_scheduler, downloads):
+    scheduler = make_scheduler(concurrency=2)
+    playlist = _Playlist('a', 6)
+    scheduler.add(playlist)
+    assert scheduler.is_offline(playlist)
+    time.sleep(0.05)
+    assert downloads.cached == set()
+
+    scheduler._on_auth_state_changed(True)
+    _wait_idle(scheduler)
+    assert downloads.cached == set(track.filename for track in playlist.tracks)
+    assert downloads.max_active <= 2
+    assert all(name.startswith('clay-offline-') for name in downloads.threads)
+    assert scheduler.messages[-1] == u'Available offline:\nPlaylist a: 6/6'
+
+
+def test_pins_tracks_of_offline_collections(make_scheduler, downloads):
+    scheduler = make_scheduler()
+    first, second = _Playlist('a', 2), _Playlist('b', 2)
+    scheduler.add(first)
+    scheduler.add(second)
+    assert downloads.pinned == set(track.filename for track in first.tracks + second.tracks)
+    scheduler.remove(first)
+    assert not scheduler.is_offline(first)
+    assert downloads.pinned == set(track.filename for track in second.tracks)
+
+
+def test_skips_cached_tracks_and_counts_failures(make_scheduler, downloads):
+    scheduler = make_scheduler()
+    playlist = _Playlist('a', 4)
+    downloads.cached.add(playlist.tracks[0].filename)
+    downloads.failing.add(playlist.tracks[1].filename)
+    scheduler._on_auth_state_changed(True)
+    scheduler.add(playlist)
+    _wait_idle(scheduler)
+    assert scheduler.messages[-1] == u'Available offline:\nPlaylist a: 3/4, 1 failed'
+
+
+def test_collections_are_restored(make_scheduler, downloads):
+    playlist = _Playlist('a', 3)
+    make_scheduler().add(playlist)
+    downloads.pinned = set()
+    restored = make_scheduler()
+    assert restored.is_offline(playlist)
+    assert downloads.pinned == set(track.filename for track in playlist.tracks)
+    restored._on_auth_state_changed(True)
+    _wait_idle(restored)
+    assert downloads.cached == set(track.filename for track in playlist.tracks)
+
+
+def test_stops_once_audio_budget_is_full(make_scheduler, downloads):
+    downloads.budget = 3 * offline._OfflineTrack('x', None, 1000).estimated_size
+    scheduler = make_scheduler(concurrency=1)
+    scheduler._on_auth_state_changed(True)
+    scheduler.add(_Playlist('a', 5))
+    _wait_idle(scheduler)
+    assert len(downloads.cached) == 3
+    assert scheduler.messages[-1].startswith(
+        u'Offline downloads stopped, audio cache budget ({} MB) is full:'.format(
+            downloads.budget // MEGABYTE
+        )
+    )
+
+
+def test_sync_updates_collections_with_changed_tracks(make_scheduler, downloads):
+    scheduler = make_scheduler()
+    scheduler._on_auth_state_changed(True)
+    partial = _Playlist('a', 2)
+    scheduler.add(partial)
+    _wait_idle(scheduler)
+
+    loaded = _Playlist('a', 5)
+    other = _Playlist('b', 3)
+    scheduler.sync([loaded, other])
+    _wait_idle(scheduler)
+    assert downloads.cached == set(track.filename for track in loaded.tracks)
+    assert not scheduler.is_offline(other)
+
+    messages = len(scheduler.messages)
+    scheduler.sync([_Playlist('a', 5)])
+    assert len(scheduler.messages) == messages
@@ -0,0 +1,124 @@
+"""
+Tests for queue & prefetching of :mod:`clay.player`.
+"""
+from threading import Event, current_thread
+
+import pytest
+
+from clay.settings import settings
+from clay.workers import WorkerPool
+
+try:
+    from clay import player
+except (ImportError, OSError):
+    pytest.skip('libVLC is not available', allow_module_level=True)
+
+
+class _Track(object):
+    """
+    Minimal stand-in for :class:`clay.gp.Track`.
+    """
+    def __init__(self, name):
+        self.filename = name + '.mp3'
+        self.store_id = name
+
+    def get_url(self, callback, prefetch=False):
+        assert prefetch
+        callback('http://example.com/' + self.filename, None, self)
+
+    def __repr__(self):
+        return self.store_id
+
+
+@pytest.fixture
+def play_settings(monkeypatch):
+    """
+    Return a dict that overrides settings.
+    """
+    values = {'prefetch_tracks': 2, 'prefetch_audio': True}
+    get = settings.get
+    monkeypatch.setattr(
+        settings, 'get',
+        lambda key, *sections: values[key] if key in values else get(key, *sections)
+    )
+    monkeypatch.setattr(settings, 'get_is_file_cached', lambda filename: filename == 'cached.mp3')
+    return values
+
+
+@pytest.fixture
+def download_pool():
+    """
+    Download pool that is shut down after test.
+    """
+    pool = WorkerPool(1, 'clay-test-download')
+    yield pool
+    pool.shutdown()
+
+
+def _make_queue(names, random=False, repeat_one=False):
+    queue = player._Queue()
+    queue.load([_Track(name) for name in names])
+    queue.random = random
+    queue.repeat_one = repeat_one
+    return queue
+
+
+@pytest.mark.parametrize('random', [False, True])
+def test_upcoming_tracks_are_played_next(random):
+    queue = _make_queue(['a', 'b', 'c', 'd', 'e'], random=random)
+    upcoming = queue.get_upcoming_tracks(3)
+    assert len(upcoming) == 3
+    assert [queue.next() for _ in upcoming] == upcoming
+
+
+def test_upcoming_tracks_start_with_repeated_track():
+    queue = _make_queue(['a', 'b', 'c'], repeat_one=True)
+    assert queue.get_upcoming_tracks(2)[0] is queue.get_current_track()
+
+
+def test_no_upcoming_tracks_in_empty_queue():
+    assert _make_queue([]).get_upcoming_tracks(2) == []
+
+
+def _make_prefetcher(names, download_pool):
+    saved = []
+    finished = Event()
+
+    def save(url, track):
+        saved.append((url, track.store_id, current_thread().name))
+        finished.set()
+
+    prefetcher = player._Prefetcher(_make_queue(names), save, download_pool)
+    return prefetcher, saved, finished
+
+
+def test_prefetched_audio_is_saved_on_download_pool(play_settings, download_pool):
+    prefetcher, saved, finished = _make_prefetcher(['a', 'b', 'cached', 'c'], download_pool)
+    prefetcher.reset()
+    assert finished.wait(5)
+    download_pool.shutdown()
+    assert [store_id for _, store_id, _ in saved] == ['b']
+    assert saved[0][0] == 'http://example.com/b.mp3'
+    assert saved[0][2] == 'clay-test-download-0'
+
+
+def test_audio_is_not_saved_if_disabled(play_settings, download_pool):
+    play_settings['prefetch_audio'] = False
+    prefetcher, saved, _ = _make_prefetcher(['a', 'b', 'c'], download_pool)
+    prefetcher.reset()
+    download_pool.shutdown()
+    assert saved == []
+
+
+def test_stale_downloads_are_dropped(play_settings, download_pool):
+    prefetcher, saved, finished = _make_prefetcher(['a', 'b', 'c', 'd'], download_pool)
+    release = Event()
+    download_pool.submit(0, release.wait, 5)
+    prefetcher.reset()
+    # Queue has changed before queued downloads have started.
+    play_settings['prefetch_tracks'] = 1
+    prefetcher.reset()
+    release.set()
+    assert finished.wait(5)
+    download_pool.shutdown()
+    assert [store_id for _, store_id, _ in saved] == ['b']
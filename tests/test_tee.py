@@ -0,0 +1,125 @@
+"""
+Tests for :mod:`clay.tee`.
+"""
+from threading import Event
+import io
+import os
+import uuid
+
+import pytest
+import requests
+
+from clay import tee
+from clay.settings import settings
+
+DATA = os.urandom(256 * 1024)
+
+
+class _FakeDownload(object):
+    """
+    Replaces :meth:`clay.gp._GP.save_stream_to_cache`: writes first half of data,
+    waits for :attr:`.release` and writes the rest.
+    """
+    def __init__(self, report_total=True):
+        self.report_total = report_total
+        self.release = Event()
+        self.calls = 0
+
+    def __call__(self, url, filename, on_progress=None):
+        self.calls += 1
+        total = len(DATA) if self.report_total else None
+        half = len(DATA) // 2
+        path = settings.get_partial_file_path(filename)
+        with io.open(path, 'wb') as partial:
+            partial.write(DATA[:half])
+        on_progress(half, total)
+        self.release.wait(5)
+        with io.open(path, 'ab') as partial:
+            partial.write(DATA[half:])
+        on_progress(len(DATA), total)
+        return settings.commit_partial_file(filename)
+
+
+@pytest.fixture
+def download(monkeypatch):
+    """
+    Fake download that is released after test.
+    """
+    fake = _FakeDownload()
+    monkeypatch.setattr(tee.gp, 'save_stream_to_cache', fake)
+    yield fake
+    fake.release.set()
+
+
+@pytest.fixture
+def tee_server():
+    """
+    Tee server that is stopped after test.
+    """
+    server = tee._TeeServer()
+    yield server
+    if server._server is not None:
+        server._server.shutdown()
+        server._server.server_close()
+
+
+def _start(tee_server):
+    return tee_server.start('http://example.com/stream', uuid.uuid4().hex + '.mp3')
+
+
+def test_serves_whole_file_while_downloading(tee_server, download):
+    url = _start(tee_server)
+    response = requests.get(url, stream=True, timeout=5)
+    assert response.status_code == 200
+    assert response.headers['Content-Length'] == str(len(DATA))
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    first = response.raw.read(len(DATA) // 2)
+    download.release.set()
+    assert first + response.raw.read() == DATA
+    assert download.calls == 1
+
+
+def test_serves_range_that_is_not_downloaded_yet(tee_server, download):
+    url = _start(tee_server)
+    offset = len(DATA) * 3 // 4
+    download.release.set()
+    response = requests.get(url, headers={'Range': 'bytes={}-'.format(offset)}, timeout=5)
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes {}-{}/{}'.format(
+        offset, len(DATA) - 1, len(DATA)
+    )
+    assert response.headers['Content-Length'] == str(len(DATA) - offset)
+    assert response.content == DATA[offset:]
+
+
+def test_serves_range_of_finished_download(tee_server, download):
+    url = _start(tee_server)
+    download.release.set()
+    assert requests.get(url, timeout=5).content == DATA
+    response = requests.get(url, headers={'Range': 'bytes=100-'}, timeout=5)
+    assert response.status_code == 206
+    assert response.content == DATA[100:]
+    assert download.calls == 1
+
+
+def test_rejects_range_beyond_file_size(tee_server, download):
+    url = _start(tee_server)
+    response = requests.get(url, headers={'Range': 'bytes={}-'.format(len(DATA))}, timeout=5)
+    assert response.status_code == 416
+
+
+def test_ignores_range_while_size_is_unknown(tee_server, download, monkeypatch):
+    monkeypatch.setattr(tee, 'START_TIMEOUT', 0.1)
+    download.report_total = False
+    url = _start(tee_server)
+    response = requests.get(url, headers={'Range': 'bytes=100-'}, stream=True, timeout=5)
+    assert response.status_code == 200
+    assert 'Content-Length' not in response.headers
+    download.release.set()
+    assert response.raw.read() == DATA
+
+
+def test_unknown_stream_is_not_found(tee_server, download):
+    url = _start(tee_server)
+    response = requests.get(url.rsplit('/', 1)[0] + '/unknown.mp3', timeout=5)
+    assert response.status_code == 404
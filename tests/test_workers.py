@@ -0,0 +1,98 @@
+"""
+Tests for :mod:`clay.workers`.
+"""
+from threading import Event, current_thread
+
+import pytest
+
+from clay.workers import WorkerPool, \
+    PRIORITY_PLAYBACK, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+
+
+@pytest.fixture
+def pool():
+    """
+    Single-threaded pool that is shut down after test.
+    """
+    pool = WorkerPool(1, 'clay-test')
+    yield pool
+    pool.shutdown()
+
+
+def test_tasks_are_picked_by_priority(pool):
+    started = Event()
+    release = Event()
+    finished = Event()
+    order = []
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    pool.submit(PRIORITY_BACKGROUND, block)
+    assert started.wait(5)
+    pool.submit(PRIORITY_BACKGROUND, order.append, 'background')
+    pool.submit(PRIORITY_INTERACTIVE, order.append, 'interactive-1')
+    pool.submit(PRIORITY_PLAYBACK, order.append, 'playback')
+    pool.submit(PRIORITY_INTERACTIVE, order.append, 'interactive-2')
+    pool.submit(PRIORITY_BACKGROUND, finished.set)
+    release.set()
+    assert finished.wait(5)
+    assert order == ['playback', 'interactive-1', 'interactive-2', 'background']
+
+
+def test_wait_runs_queued_task_inline(pool):
+    finished = Event()
+    result = {}
+
+    def outer():
+        inner = pool.submit_task(PRIORITY_INTERACTIVE, current_thread)
+        # The only worker is busy running this function, so waiting
+        # for a queued task must not deadlock.
+        result['outer'] = current_thread()
+        result['inner'] = inner.wait()
+        finished.set()
+
+    pool.submit(PRIORITY_INTERACTIVE, outer)
+    assert finished.wait(5)
+    assert result['inner'] is result['outer']
+    assert result['outer'].name == 'clay-test-0'
+
+
+def test_task_runs_once(pool):
+    calls = []
+    task = pool.submit_task(PRIORITY_INTERACTIVE, calls.append, 1)
+    task.wait()
+    task.run()
+    task.wait()
+    assert calls == [1]
+
+
+def test_wait_raises_task_error(pool):
+    task = pool.submit_task(PRIORITY_INTERACTIVE, int, 'not a number')
+    with pytest.raises(ValueError):
+        task.wait()
+    assert task.done
+    assert pool.get_stats()['failed'] == 0
+
+
+def test_pool_size_is_bounded():
+    pool = WorkerPool(2, 'clay-test')
+    release = Event()
+    try:
+        tasks = [pool.submit_task(PRIORITY_BACKGROUND, release.wait, 5) for _ in range(5)]
+        assert pool.get_stats()['threads'] == 2
+    finally:
+        release.set()
+        for task in tasks:
+            task.wait()
+        pool.shutdown()
+
+
+def test_submit_after_shutdown_is_dropped():
+    pool = WorkerPool(1, 'clay-test')
+    pool.shutdown()
+    calls = []
+    pool.submit(PRIORITY_INTERACTIVE, calls.append, 1)
+    assert calls == []
+    assert pool.get_stats()['queued'] == 0